@@ -0,0 +1,227 @@
+"""
+BatchGame.py: Play many independent heads-up rounds in lockstep with NumPy.
+
+Each lane is its own table, with its own shoe and one seat. Hand totals,
+soft-ace counts, bets and flags are kept as arrays, one column per hand
+slot (a round can grow to several hands by splitting). Every decision is
+made for all lanes at once, by indexing the compiled Strategy tables.
+
+Only a fixed strategy is supported: no tracing, no verbose output, and
+no per-round changes of bet or strategy.
+"""
+
+from typing import Dict
+
+import numpy as np
+
+from Game import Statistics, BET, default_rules
+from Shoe import DECK, SEED
+from Strategy import Strategy, HIT, DOUBLE, SURRENDER
+
+# Default number of lanes (tables) played at once.
+LANES = 10000
+
+
+class BatchGame:
+    def __init__(self,
+                 lanes=LANES,
+                 rules: Dict[str, int] = default_rules,
+                 strategy={},
+                 penetration=0.25,
+                 repeatable=False,
+                 seed=None) -> None:
+        self.lanes = lanes
+        self.rules = rules
+        self.strategy = Strategy(strategy)
+        self.codes = np.array(self.strategy.codes, dtype=np.uint8)
+        self.splits = np.array(self.strategy.splits, dtype=np.uint8)
+        self.st = Statistics()
+
+        self.hit_s17 = rules['hit_s17']
+        self.max_splits = rules['max_split_hands'] - 1
+        self.max_split_aces = rules['max_split_aces'] - 1
+        self.can_hit_split_aces = rules['can_hit_split_aces']
+        self.das_allowed = rules['das_allowed']
+        self.slots = 1 + 2 * max(self.max_splits, self.max_split_aces)
+
+        if seed is None and repeatable:
+            seed = SEED
+        # NumPy wants a seed as numbers, so use the string's bytes.
+        self.rng = np.random.default_rng(
+            list(seed.encode()) if seed is not None else None)
+        num_decks = rules['num_decks']
+        self.deck = np.array(DECK * num_decks, dtype=np.int8)
+        self.shoe_size = len(self.deck)
+        self.shuffle_point = int(num_decks * 52 * penetration)
+        self.shoes = np.empty((lanes, self.shoe_size), dtype=np.int8)
+        self.pos = np.zeros(lanes, dtype=np.int64)
+        self.lane = np.arange(lanes)
+        self.shuffle(self.lane)
+
+    def shuffle(self, lanes: np.ndarray) -> None:
+        "Put a freshly shuffled shoe in each of 'lanes'."
+        fresh = np.tile(self.deck, (len(lanes), 1))
+        self.shoes[lanes] = self.rng.permuted(fresh, axis=1)
+        self.pos[lanes] = 0
+
+    def deal(self, lanes: np.ndarray) -> np.ndarray:
+        "Deal a card to each of 'lanes'."
+        pos = self.pos[lanes]
+        self.pos[lanes] = pos + 1
+        return self.shoes[lanes, pos].astype(np.int16)
+
+    def deal_all(self) -> np.ndarray:
+        "Deal a card to every lane."
+        cards = self.shoes[self.lane, self.pos]
+        self.pos += 1
+        return cards.astype(np.int16)
+
+    @staticmethod
+    def add(total: np.ndarray, soft: np.ndarray, cards: np.ndarray) -> None:
+        "Add 'cards' to hands in place, counting an ace as 1 if need be."
+        total += cards
+        soft += cards == 11
+        harden = (total > 21) & (soft > 0)
+        total -= 10 * harden
+        soft -= harden
+
+    def play_round(self) -> None:
+        "Play one round on every lane, and add the results to the stats."
+        L, H = self.lanes, self.slots
+        self.shuffle(np.flatnonzero(self.shoe_size - self.pos <
+                                    self.shuffle_point))
+
+        # Hand slots. Slot 0 is the hand dealt; splits append new slots.
+        total = np.zeros((L, H), dtype=np.int16)
+        soft = np.zeros((L, H), dtype=np.int16)
+        first = np.zeros((L, H), dtype=np.int16)
+        second = np.zeros((L, H), dtype=np.int16)
+        bet = np.zeros((L, H), dtype=np.int64)
+        is_split = np.zeros((L, H), dtype=bool)
+        no_hit = np.zeros((L, H), dtype=bool)
+        blackjack = np.zeros((L, H), dtype=bool)
+        surrendered = np.zeros((L, H), dtype=bool)
+        obsolete = np.zeros((L, H), dtype=bool)
+        num_hands = np.ones(L, dtype=np.int64)
+        splits_done = np.zeros(L, dtype=np.int64)
+
+        first[:, 0] = self.deal_all()
+        second[:, 0] = self.deal_all()
+        t, s = first[:, 0].copy(), (first[:, 0] == 11).astype(np.int16)
+        self.add(t, s, second[:, 0])
+        total[:, 0], soft[:, 0] = t, s
+        blackjack[:, 0] = t == 21
+        bet[:, 0] = BET
+
+        up = self.deal_all()
+        d_total, d_soft = up.copy(), (up == 11).astype(np.int16)
+        self.add(d_total, d_soft, self.deal_all())
+        d_bj = d_total == 21
+        live = ~d_bj
+
+        for j in range(H):
+            rows = np.flatnonzero(live & (j < num_hands) & ~no_hit[:, j])
+            if rows.size == 0:
+                continue
+            t, s = total[rows, j], soft[rows, j]
+            u = up[rows]
+            code = self.codes[u, np.minimum(s, 1), t]
+
+            sur = code & SURRENDER > 0
+            surrendered[rows[sur], j] = True
+            keep = ~sur
+
+            # Split
+            card = first[rows, j]
+            limit = np.where(card == 11, self.max_split_aces,
+                             self.max_splits)
+            split = keep & (card == second[rows, j]) & \
+                (self.splits[u, card] > 0) & (splits_done[rows] < limit)
+            if split.any():
+                srows = rows[split]
+                sp = card[split]
+                obsolete[srows, j] = True
+                splits_done[srows] += 1
+                for k in (0, 1):
+                    cols = num_hands[srows] + k
+                    c2 = self.deal(srows)
+                    nt, ns = sp.copy(), (sp == 11).astype(np.int16)
+                    self.add(nt, ns, c2)
+                    first[srows, cols] = sp
+                    second[srows, cols] = c2
+                    total[srows, cols] = nt
+                    soft[srows, cols] = ns
+                    bet[srows, cols] = BET
+                    is_split[srows, cols] = True
+                    no_hit[srows, cols] = (sp == 11) & \
+                        (not self.can_hit_split_aces)
+                num_hands[srows] += 2
+                keep &= ~split
+
+            # Double down
+            dbl = keep & (code & DOUBLE > 0)
+            if not self.das_allowed:
+                dbl &= ~is_split[rows, j]
+            if dbl.any():
+                drows = rows[dbl]
+                dt, ds = t[dbl], s[dbl]
+                self.add(dt, ds, self.deal(drows))
+                total[drows, j], soft[drows, j] = dt, ds
+                bet[drows, j] *= 2
+                keep &= ~dbl
+
+            # Hit or stand
+            rows, t, s, u = rows[keep], t[keep], s[keep], u[keep]
+            while rows.size:
+                hit = self.codes[u, np.minimum(s, 1), t] & HIT > 0
+                rows, t, s, u = rows[hit], t[hit], s[hit], u[hit]
+                self.add(t, s, self.deal(rows))
+                total[rows, j], soft[rows, j] = t, s
+                ok = t <= 21
+                rows, t, s, u = rows[ok], t[ok], s[ok], u[ok]
+
+        # Dealer
+        rows = np.flatnonzero(live)
+        t, s = d_total[rows], d_soft[rows]
+        while rows.size:
+            hit = (t < 17) | ((t == 17) & (s > 0) & bool(self.hit_s17))
+            rows, t, s = rows[hit], t[hit], s[hit]
+            self.add(t, s, self.deal(rows))
+            d_total[rows], d_soft[rows] = t, s
+
+        self.settle(total, bet, blackjack, surrendered,
+                    (np.arange(H) < num_hands[:, None]) & ~obsolete,
+                    d_total[:, None], d_bj[:, None])
+        self.st.rounds_played += L
+        self.st.hands_played += L
+
+    def settle(self, total, bet, blackjack, surrendered, valid,
+               dealer, d_bj) -> None:
+        "Add the results of every valid hand slot to the stats."
+        st = self.st
+        busted = total > 21
+        bj_win = valid & blackjack & ~d_bj
+        rest = valid & ~bj_win
+        on_bj = rest & d_bj
+        normal = rest & ~d_bj
+        lost = normal & busted
+        sur = normal & ~busted & surrendered
+        normal &= ~busted & ~surrendered
+        d_bust = dealer > 21
+        won = normal & (d_bust | (total > dealer))
+        lost |= normal & ~d_bust & (dealer > total)
+        push = normal & ~d_bust & (dealer == total)
+
+        st.total_bet += int(bet[valid].sum())
+        st.blackjacks_won += int(bj_win.sum())
+        st.total_surrenders += int(sur.sum())
+        won_amt = np.where(bj_win, bet * 3 // 2, 0) + np.where(won, bet, 0)
+        lost_amt = np.where(lost | (on_bj & ~blackjack), bet, 0) + \
+            np.where(sur, bet // 2, 0)
+        st.blackjack_bonus += int((bet * 3 // 2 - bet)[bj_win].sum())
+        st.surrender_refund += int((bet - bet // 2)[sur].sum())
+        st.total_won += int(won_amt.sum())
+        st.total_lost += int(lost_amt.sum())
+        st.total_push += int(bet[push].sum() + bet[on_bj & blackjack].sum())
+        net = (won_amt - lost_amt).sum(axis=1)
+        st.net_sum_sq += int((net * net).sum())
@@ -1,5 +1,5 @@
 
-from log import log
+import log
 from Hand import Hand
 from Shoe import Shoe
 
@@ -9,25 +9,28 @@ class Dealer:
         self.shoe = shoe
         self.verbose = verbose
         self.hit_s17 = hit_s17
-        self.hand: Hand
+        self.hand = Hand(shoe)
         self.value: int
 
     def get_hand(self) -> None:
         "Deal yourself a hand."
-        self.hand = Hand(self.shoe)
-        log(f"dealer hand: {self.hand}")
+        self.hand.reset()
+        if log.enabled:
+            log.log(f"dealer hand: {self.hand}")
         assert self.hand.busted is False
 
     def play_hand(self) -> None:
         "Play dealer hand."
-        log(f"   hand: {self.hand}")
+        if log.enabled:
+            log.log(f"   hand: {self.hand}")
         if self.verbose:
             print(f"Dealer: {self.hand}")
         while self.hand.value < 17 \
                 or (self.hand.value == 17 and self.hand.is_soft()
                     and self.hit_s17):
             self.hand.hit()
-            log(f"   hand: {self.hand}")
+            if log.enabled:
+                log.log(f"   hand: {self.hand}")
             if self.verbose:
                 print(f"hit...{self.hand}")
             if self.hand.value > 21 and self.hand.is_soft():
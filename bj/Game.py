@@ -1,11 +1,16 @@
 
+import sys
 import time
-from typing import Set, Tuple, List
+from time import perf_counter_ns
+from typing import List, Optional, TextIO, Tuple
 
-from log import log
+import log
+import running
 from Shoe import Shoe
+from InfiniteShoe import InfiniteShoe, ROUND_RESERVE
 from Dealer import Dealer
 from Player import Player
+from Strategy import Strategy
 
 # This should be even, so all wins and losses are integers.
 BET = 2
@@ -28,27 +33,52 @@ class Game:
                  strategy={},
                  penetration=0.25,
                  repeatable=False,
-                 verbose=False) -> None:
+                 seed=None,
+                 verbose=False,
+                 shoe=None,
+                 count=None,
+                 report=None,
+                 infinite=False,
+                 profile: Optional['Profile'] = None) -> None:
         self.verbose = verbose
+        # A count.CountPlay, to set each round's bet and strategy
+        self.count = count
+        # A report.HandReport, to count results by starting hand
+        self.report = report
+        # A Profile, to time each phase of play_round()
+        self.profile = profile
         self.num_players = players
         self.players: List[Player] = []
-        self.strategy: Set[Tuple[str, int, int]] = strategy
+        self.strategy = Strategy(strategy)
         self.rules = rules
         self.num_decks = rules['num_decks']
         self.shuffle_point = int(self.num_decks * 52 * penetration)
         self.st = Statistics()
-        self.shoe = Shoe(self.num_decks, repeatable=repeatable)
+        # Games can share a shoe, to play the same cards.
+        if shoe is None:
+            if infinite:
+                shoe = InfiniteShoe(repeatable=repeatable, seed=seed)
+            else:
+                shoe = Shoe(self.num_decks, repeatable=repeatable, seed=seed)
+        self.shoe = shoe
+        if isinstance(shoe, InfiniteShoe):
+            # Only top it up often enough that a round never runs out.
+            self.shuffle_point = ROUND_RESERVE
 
-        log(f"house rules: {rules}")
+        if log.enabled:
+            log.log(f"house rules: {rules}")
         self.hit_s17 = rules['hit_s17']
 
-        log("shuffle")
+        if log.enabled:
+            log.log("shuffle")
         self.shoe.shuffle()
-        log("new dealer")
+        if log.enabled:
+            log.log("new dealer")
         self.dealer = Dealer(self.shoe, hit_s17=self.hit_s17,
                              verbose=self.verbose)
         for i in range(self.num_players):
-            log(f"new player: {i + 1}")
+            if log.enabled:
+                log.log(f"new player: {i + 1}")
             p = Player(self.shoe, self.strategy, self.rules, self.verbose,
                        bet_amount=BET, seat=i+1)
             self.players.append(p)
@@ -60,64 +90,119 @@ class Game:
         Otherwise, play each player hand, and then the dealer hand.
         Collect data on win/loss/push.
         """
+        prof = self.profile
+        if prof is not None:
+            start = t = perf_counter_ns()
         if self.shoe.remaining() < self.shuffle_point:
-            log("shuffle")
+            if log.enabled:
+                log.log("shuffle")
             self.shoe.shuffle()
+            if prof is not None:
+                prof.shuffles += 1
+                now = perf_counter_ns()
+                prof.shuffle_ns += now - t
+                t = now
+
+        if self.count is not None:
+            tc, strategy, bet = self.count.start_round(self.shoe)
+            if log.enabled:
+                log.log(f"true count: {tc} bet: {bet}")
+            for p in self.players:
+                p.strategy = strategy
+                p.bet_amount = bet
 
         # Deal player hands
         for p in self.players:
             self.st.hands_played += 1
             p.get_hand()
-            log(f"player {p.seat}  hand: {p.hands[0]}")
+            if log.enabled:
+                log.log(f"player {p.seat}  hand: {p.hands[0]}")
             if self.verbose:
                 print(f"Player: {p.hands[0]}")
             if p.hands[0].blackjack:
-                log("player blackjack")
+                if log.enabled:
+                    log.log("player blackjack")
                 if self.verbose:
                     print("Player BJ")
 
         self.dealer.get_hand()
+        if prof is not None:
+            now = perf_counter_ns()
+            prof.deal_ns += now - t
+            t = now
         if self.dealer.hand.blackjack:
-            log("dealer blackjack")
+            if log.enabled:
+                log.log("dealer blackjack")
             if self.verbose:
                 print("Dealer BJ")
             # No need to play the players' hands. They will all lose
             # unless they have a blackjack also.
         else:
             for p in self.players:
-                log(f"player {p.seat}")
+                if log.enabled:
+                    log.log(f"player {p.seat}")
                 p.play_hands(self.dealer.up_card())
+            if prof is not None:
+                now = perf_counter_ns()
+                prof.player_ns += now - t
+                t = now
 
-            log(f"dealer: {self.dealer.hand}")
+            if log.enabled:
+                log.log(f"dealer: {self.dealer.hand}")
             # log("play dealer hand")
             self.dealer.play_hand()
+            if prof is not None:
+                now = perf_counter_ns()
+                prof.dealer_ns += now - t
+                t = now
 
         self.update_stats()
+        if prof is not None:
+            now = perf_counter_ns()
+            prof.settle_ns += now - t
+            prof.count_round(self.players)
 
         for p in self.players:
             # This clears out hands just played.
             p.end_round()
         self.st.rounds_played += 1
+        if prof is not None:
+            prof.round_ns += perf_counter_ns() - start
+
+    def play_rounds(self, rounds: int) -> None:
+        "Play 'rounds' rounds."
+        for i in range(rounds):
+            if log.enabled:
+                log.log(f"round: {self.st.rounds_played + 1}")
+            self.play_round()
 
     def update_stats(self) -> None:
         "Determine the result of each player hand. Compute wins and losses."
-        log("update stats HERE --------------")
+        if log.enabled:
+            log.log("update stats HERE --------------")
         dlr = self.dealer.hand.value
         dbj = self.dealer.hand.blackjack
         dbust = self.dealer.hand.busted
-        log(f"dealer has {dlr}")
+        net = self.st.total_won - self.st.total_lost
+        if log.enabled:
+            log.log(f"dealer has {dlr}")
         if self.verbose:
             print('\nRESULTS')
+        report = self.report
         for p in self.players:
+            if report is not None:
+                seat_net = self.st.total_won - self.st.total_lost
             for x in enumerate(p.hands):
                 h = x[1]
-                log(f"p{p.seat} hand {x[0]+1}: {h.value}")
+                if log.enabled:
+                    log.log(f"p{p.seat} hand {x[0]+1}: {h.value}")
                 if self.verbose:
                     print(f"hand {x[0]+1}: {h.value}")
                 if h.obsolete:
                     if self.verbose:
                         print('obsolete')
-                    log("hand is obsolete")
+                    if log.enabled:
+                        log.log("hand is obsolete")
                     # Hand has been split into two. Nothing to do.
                     continue
                 self.st.total_bet += h.bet_amount
@@ -125,7 +210,9 @@ class Game:
                     if not dbj:
                         self.st.blackjacks_won += 1
                         win = int(1.5 * h.bet_amount)
-                        log(f"WIN: blackjack: {win}")
+                        self.st.blackjack_bonus += win - h.bet_amount
+                        if log.enabled:
+                            log.log(f"WIN: blackjack: {win}")
                         if self.verbose:
                             print(f'BJ: WIN {win}')
                         self.st.total_won += win
@@ -136,80 +223,82 @@ class Game:
                         continue
                 if dbj:
                     if h.blackjack:
-                        log("PUSH: blackjacks")
+                        if log.enabled:
+                            log.log("PUSH: blackjacks")
                         if self.verbose:
                             print('BJ: PUSH')
                         self.st.total_push += h.bet_amount
                     else:
-                        log(f"LOSS. Dealer BJ: {h.bet_amount}")
+                        if log.enabled:
+                            log.log(f"LOSS. Dealer BJ: {h.bet_amount}")
                         if self.verbose:
                             print(f'LOSE to dealer BJ. LOSE {h.bet_amount}.')
                         self.st.total_lost += h.bet_amount
                 else:  # NO BJs
                     if h.busted:
-                        log(f"LOSS - busted: {h.bet_amount}")
+                        if log.enabled:
+                            log.log(f"LOSS - busted: {h.bet_amount}")
                         if self.verbose:
                             print(f'BUST: LOSE {h.bet_amount}')
                         self.st.total_lost += h.bet_amount
                     elif h.surrendered:
                         loss = h.bet_amount // 2
-                        log(f"SURRENDER: LOSE {loss}")
+                        if log.enabled:
+                            log.log(f"SURRENDER: LOSE {loss}")
                         if self.verbose:
                             print(f'SURRENDER: LOSE {loss}')
                         self.st.total_lost += loss
-                        self.st.total_surrenders += 1  # XXX Assumes bet = 2 !
+                        self.st.total_surrenders += 1
+                        self.st.surrender_refund += h.bet_amount - loss
                     elif dbust:
-                        log(f"WIN - dealer bust: {h.bet_amount}")
+                        if log.enabled:
+                            log.log(f"WIN - dealer bust: {h.bet_amount}")
                         if self.verbose:
                             print(f'Dealer bust: WIN {h.bet_amount}')
                         self.st.total_won += h.bet_amount
                     elif dlr > h.value:
-                        log(f"LOSS: {h.bet_amount}")
+                        if log.enabled:
+                            log.log(f"LOSS: {h.bet_amount}")
                         if self.verbose:
                             print(f'LOSE {h.bet_amount}')
                         self.st.total_lost += h.bet_amount
                     elif h.value > dlr:
-                        log(f"WIN: {h.bet_amount}")
+                        if log.enabled:
+                            log.log(f"WIN: {h.bet_amount}")
                         if self.verbose:
                             print(f'WIN {h.bet_amount}')
                         self.st.total_won += h.bet_amount
                     else:
-                        log("PUSH")
+                        if log.enabled:
+                            log.log("PUSH")
                         if self.verbose:
                             print('PUSH result 0')
                         self.st.total_push += h.bet_amount
-        log("                  --------------")
+            if report is not None:
+                report.add(p.hands, self.dealer.up_card(), dbj,
+                           self.st.total_won - self.st.total_lost - seat_net)
+        net = self.st.total_won - self.st.total_lost - net
+        self.st.net_sum_sq += net * net
+        if log.enabled:
+            log.log("                  --------------")
 
         # if self.dealer.hand.blackjack:
         #     self.st.dealer_blackjacks += 1
 
     def write_stats(self, fname: str, strategy_name: str) -> None:
         "Append stats to the stats file"
-        log("writing stats")
-        with open(fname, 'at') as f:
-            print("time", time.asctime(), file=f)
-            print("strategy", strategy_name, file=f)
-            print("rounds_played", self.st.rounds_played, file=f)
-            print("hands_played", self.st.hands_played, file=f)
-            print("total_bet", self.st.total_bet, file=f)
-            print("total_won", self.st.total_won, file=f)
-            print("total_lost", self.st.total_lost, file=f)
-            print("total_push", self.st.total_push, file=f)
-            # print("dealer_bjs", self.st.dealer_blackjacks, file=f)
-            print("blackjacks_won", self.st.blackjacks_won, file=f)
-            gain = 100 * (self.st.total_won - self.st.total_lost) \
-                / self.st.total_bet
-            print(f"%win: {gain:5.4}", file=f)
-            print("-" * 20, file=f)
-            # This assertion assumes a BJ pays 3-2.
-            assert self.st.total_won + self.st.total_lost + \
-                self.st.total_push - self.st.blackjacks_won + \
-                self.st.total_surrenders == \
-                self.st.total_bet
+        if log.enabled:
+            log.log("writing stats")
+        self.st.write(fname, strategy_name)
 
 
 class Statistics():
     "Just a struct to hold the data we want to accumulate."
+    __slots__ = ('rounds_played', 'hands_played', 'blackjacks_won',
+                 'total_bet', 'total_won', 'total_lost', 'total_push',
+                 'total_surrenders', 'net_sum_sq', 'blackjack_bonus',
+                 'surrender_refund')
+
     def __init__(self) -> None:
         self.rounds_played = 0
         self.hands_played = 0
@@ -220,3 +309,113 @@ class Statistics():
         self.total_lost = 0
         self.total_push = 0
         self.total_surrenders = 0
+        # Sum of the squares of each round's net win, for the variance.
+        self.net_sum_sq = 0
+        # What blackjacks won beyond the bet, and what surrenders got
+        # back, so the totals check out whatever the bets were.
+        self.blackjack_bonus = 0
+        self.surrender_refund = 0
+
+    def merge(self, other: 'Statistics') -> None:
+        "Add the counts from another run (e.g. a worker shard) into ours."
+        self.rounds_played += other.rounds_played
+        self.hands_played += other.hands_played
+        self.blackjacks_won += other.blackjacks_won
+        self.total_bet += other.total_bet
+        self.total_won += other.total_won
+        self.total_lost += other.total_lost
+        self.total_push += other.total_push
+        self.total_surrenders += other.total_surrenders
+        self.net_sum_sq += other.net_sum_sq
+        self.blackjack_bonus += other.blackjack_bonus
+        self.surrender_refund += other.surrender_refund
+
+    def ev(self) -> Tuple[float, float]:
+        "Return the EV per hand and its standard error, in % of the bet."
+        return running.ev_stderr(self.rounds_played, self.hands_played,
+                                 self.total_won - self.total_lost,
+                                 self.net_sum_sq, BET)
+
+    def write(self, fname: str, strategy_name: str) -> None:
+        "Append stats to the stats file"
+        with open(fname, 'at') as f:
+            print("time", time.asctime(), file=f)
+            print("strategy", strategy_name, file=f)
+            print("rounds_played", self.rounds_played, file=f)
+            print("hands_played", self.hands_played, file=f)
+            print("total_bet", self.total_bet, file=f)
+            print("total_won", self.total_won, file=f)
+            print("total_lost", self.total_lost, file=f)
+            print("total_push", self.total_push, file=f)
+            # print("dealer_bjs", self.dealer_blackjacks, file=f)
+            print("blackjacks_won", self.blackjacks_won, file=f)
+            gain = 100 * (self.total_won - self.total_lost) \
+                / self.total_bet
+            print(f"%win: {gain:5.4}", file=f)
+            print("net_sum_sq", self.net_sum_sq, file=f)
+            print(f"%ev/hand: {running.interval(*self.ev())}", file=f)
+            print("-" * 20, file=f)
+            assert self.total_won + self.total_lost + \
+                self.total_push - self.blackjack_bonus + \
+                self.surrender_refund == \
+                self.total_bet
+
+
+class Profile():
+    """Time spent in each phase of Game.play_round(), and a few counts.
+
+    The times are in nanoseconds. A phase that a round skips, like
+    playing the hands when the dealer has a blackjack, adds nothing.
+    'other' in the summary is the rest of play_round(): clearing the
+    hands, and the profiling itself.
+    """
+    __slots__ = ('rounds', 'shuffle_ns', 'deal_ns', 'player_ns',
+                 'dealer_ns', 'settle_ns', 'round_ns', 'shuffles',
+                 'splits', 'doubles')
+
+    # (name in the summary, attribute)
+    PHASES = [('shuffle', 'shuffle_ns'),
+              ('deal', 'deal_ns'),
+              ('players', 'player_ns'),
+              ('dealer', 'dealer_ns'),
+              ('settle', 'settle_ns')]
+
+    def __init__(self) -> None:
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def count_round(self, players: List[Player]) -> None:
+        "Count the splits and doubles in the round just settled."
+        self.rounds += 1
+        for p in players:
+            self.splits += p.splits_done
+            for h in p.hands:
+                if h.doubled:
+                    self.doubles += 1
+
+    def merge(self, other: 'Profile') -> None:
+        "Add the times and counts from another profile into ours."
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def write(self, f: TextIO = sys.stdout) -> None:
+        "Write a summary of where the time went."
+        rounds = self.rounds or 1
+        total = self.round_ns or 1
+        print(f"profile: {self.rounds} rounds in "
+              f"{self.round_ns / 1e9:.3f} seconds", file=f)
+        print(f"{'phase':8} {'seconds':>9} {'us/round':>9} {'%':>6}",
+              file=f)
+        other = self.round_ns
+        times = []
+        for name, attr in self.PHASES:
+            ns = getattr(self, attr)
+            other -= ns
+            times.append((name, ns))
+        times.append(('other', other))
+        for name, ns in times:
+            print(f"{name:8} {ns / 1e9:9.3f} {ns / rounds / 1e3:9.3f} "
+                  f"{100 * ns / total:6.1f}", file=f)
+        for name in ('shuffles', 'splits', 'doubles'):
+            n = getattr(self, name)
+            print(f"{name:8} {n:9} {n / rounds:9.4f} per round", file=f)
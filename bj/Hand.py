@@ -1,12 +1,34 @@
 
-from log import log
+from typing import List
+
+import log
 from Shoe import Shoe
 
 
 class Hand:
-    def __init__(self, shoe: Shoe, split_card=0, bet_amount=0) -> None:
-        self.value: int
+    """A hand of cards, for a player or the dealer.
+
+    Hands are reused from round to round: reset() deals a new hand into
+    an existing object, so a Hand() alone has no cards yet.
 
+    The total and the number of aces counted as 11 are kept up to date as
+    each card arrives, so nothing is recounted. 'ace_at' is the index in
+    'cards' of the oldest ace counted as 11, or -1 if there is none.
+    """
+    __slots__ = ('shoe', 'cards', 'value', 'big_aces', 'ace_at', 'bet_amount',
+                 'blackjack', 'doubled', 'busted', 'is_split', 'no_hit',
+                 'no_double', 'obsolete', 'surrendered')
+
+    def __init__(self, shoe: Shoe) -> None:
+        self.shoe = shoe
+        self.cards: List[int] = []
+        self.value = 0
+        self.big_aces = 0
+        self.ace_at = -1
+        self.bet_amount = 0
+
+    def reset(self, split_card=0, bet_amount=0) -> None:
+        "Throw away any cards, and deal a new hand."
         self.blackjack = False
         self.doubled = False
         self.busted = False
@@ -17,34 +39,40 @@ class Hand:
         self.obsolete = False  # Set true when a pair is split into new hands.
         self.surrendered = False
 
-        self.shoe = shoe
         self.bet_amount = bet_amount
         if not split_card:
-            self.cards = [shoe.deal(), shoe.deal()]
+            c1 = self.shoe.deal()
         else:
             # This is a pair split. Deal one additional card.
-            self.cards = [split_card, shoe.deal()]
+            c1 = split_card
             self.is_split = True
+        c2 = self.shoe.deal()
+        cards = self.cards
+        cards.clear()
+        cards.append(c1)
+        cards.append(c2)
 
-        self.update_value()
+        self.value = c1 + c2
+        self.big_aces = (c1 == 11) + (c2 == 11)
+        self.ace_at = 0 if c1 == 11 else 1 if c2 == 11 else -1
         if self.value == 21:
             self.blackjack = True
-            # But wait...
-            if self.is_split and split_card == 11:
-                log("NOT blackjack")
+            # But wait... 21 on a split hand is not a blackjack.
+            if self.is_split:
+                if log.enabled:
+                    log.log("NOT blackjack")
                 self.blackjack = False
         if self.big_aces == 2:
             self.harden()
 
     def harden(self) -> None:
         "Convert one of the aces from 11 to 1"
-        first_ace = self.cards.index(11)
-        self.cards[first_ace] = 1
-        self.update_value()
-
-    def update_value(self) -> None:
-        self.value = sum(self.cards)
-        self.big_aces = self.cards.count(11)
+        self.cards[self.ace_at] = 1
+        self.value -= 10
+        self.big_aces -= 1
+        # There is never more than one ace counted as 11 before a card
+        # is added. So if one is left, it is the card just added.
+        self.ace_at = len(self.cards) - 1 if self.big_aces else -1
 
     def is_soft(self) -> bool:
         "Return True if one of the aces is counted as 11."
@@ -76,8 +104,10 @@ class Hand:
         assert not self.obsolete
         c = self.shoe.deal()
         self.cards.append(c)
-        self.update_value()
+        self.value += c
         if c == 11:
+            if not self.big_aces:
+                self.ace_at = len(self.cards) - 1
             self.big_aces += 1
         if self.value > 21:
             if self.big_aces:
@@ -0,0 +1,52 @@
+"""
+InfiniteShoe.py: A shoe with an infinite number of decks.
+
+Every card is drawn independently from the 13 ranks of Shoe.SUIT, so the
+odds never change as cards are dealt, and there is nothing to shuffle.
+Cards are made by NumPy, INFINITE_BATCH at a time, into a 'bytes' buffer
+that is dealt exactly as a Shoe deals, so Hand and Dealer can't tell the
+difference.
+
+Game calls shuffle() when fewer than ROUND_RESERVE cards are left, and
+here that just adds a new batch of cards to the ones left.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from Shoe import Shoe, SUIT, SEED
+
+# Cards made at a time
+INFINITE_BATCH = 1 << 16
+# More cards than any round can use, with every seat split to the limit.
+ROUND_RESERVE = 1024
+
+RANKS = np.array(SUIT, dtype=np.uint8)
+
+
+class InfiniteShoe(Shoe):
+    """An endless stream of cards, drawn from the ranks of SUIT.
+
+    It is seeded by 'seed', or by SEED if 'repeatable' is set, like Shoe.
+    """
+    def __init__(self, repeatable=False, seed: Optional[str] = None) -> None:
+        self.decks = 0
+        self.shoe_size = INFINITE_BATCH
+        self.shuffled = []
+        self.this_round = []
+        self.track_rounds = False
+        if seed is None and repeatable:
+            seed = SEED
+        self.rng = np.random.default_rng(
+            None if seed is None else list(seed.encode()))
+        self.use(b'')
+
+    def shuffle_batch(self) -> None:
+        "There is nothing to shuffle ahead of time."
+        pass
+
+    def shuffle(self) -> None:
+        "Add a batch of new cards to the cards left."
+        cards = RANKS[self.rng.integers(0, len(RANKS), INFINITE_BATCH)]
+        self.use(self.shoe[self.mark():] + cards.tobytes())
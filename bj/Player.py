@@ -1,15 +1,16 @@
 
-from typing import List, Set, Dict, Tuple
+from typing import List, Dict
 
 import constants as c
-from log import log
+import log
 from Shoe import Shoe
 from Hand import Hand
+from Strategy import Strategy, HIT, DOUBLE, SURRENDER
 
 
 class Player:
     def __init__(self, shoe: Shoe,
-                 strategy: Set[Tuple[str, int, int]],
+                 strategy: Strategy,
                  rules: Dict[str, int],
                  verbose: bool,
                  bet_amount=0, seat=0) -> None:
@@ -25,50 +26,57 @@ class Player:
         self.seat = seat
         self.bet_amount = bet_amount
         self.hands: List[Hand] = []
+        # Hands from earlier rounds, to be reset and used again.
+        self.pool: List[Hand] = []
+        # Strategy rows for the current dealer up-card
+        self.codes: List[bytearray]
+        self.splits: bytearray
 
     def log_hands(self):
         "Log all hand contents."
-        log("All hands:")
+        log.log("All hands:")
         for h in self.hands:
-            log(f"   hand: {h}")
+            log.log(f"   hand: {h}")
 
     def get_hand(self, split_card=0) -> None:
         "Get a new hand, either with 2 new cards, or 1 new card to a split."
-        if split_card == 0:
-            self.hands.append(Hand(self.shoe, bet_amount=self.bet_amount))
-        else:
-            h = (Hand(self.shoe, split_card=split_card,
-                 bet_amount=self.bet_amount))
-            if split_card == 11 and not self.can_hit_split_aces:
-                h.no_hit = True
-            self.hands.append(h)
+        h = self.pool.pop() if self.pool else Hand(self.shoe)
+        h.reset(split_card=split_card, bet_amount=self.bet_amount)
+        if split_card == 11 and not self.can_hit_split_aces:
+            h.no_hit = True
+        self.hands.append(h)
 
     def play_hands(self, up_card: int) -> None:
         "Play each hands. Split pairs generate new hands."
+        self.codes = self.strategy.codes[up_card]
+        self.splits = self.strategy.splits[up_card]
         i = 0
         for h in self.hands:
             i += 1
-            log(f"hand {i}")
+            if log.enabled:
+                log.log(f"hand {i}")
             if self.verbose:
                 s = "soft" if h.is_soft() else ""
                 print(f"hand: {s} {h} vs {up_card}")
             if h.no_hit:
-                log("cannot hit split ace")
+                if log.enabled:
+                    log.log("cannot hit split ace")
             else:
-                if not self.maybe_surrender(h, up_card):
+                code = self.codes[h.is_soft()][h.value]
+                if not self.maybe_surrender(h, code):
                     if not self.maybe_split(h, up_card):
-                        if not self.maybe_double_down(h, up_card):
+                        if not self.maybe_double_down(h, code, up_card):
                             self.play_normal(h, up_card)
 
     def end_round(self) -> None:
         "Throw away all hands, to get ready for the next round."
-        self.hands = []
+        self.pool.extend(self.hands)
+        self.hands.clear()
         self.splits_done = 0
 
-    def maybe_surrender(self, hand: Hand, up_card: int) -> bool:
+    def maybe_surrender(self, hand: Hand, code: int) -> bool:
         "Surrender this hand if strategy says to do so."
-        key = (c.SURRENDER, hand.value, up_card)
-        if key in self.strategy:
+        if code & SURRENDER:
             hand.surrender()
             return True
         else:
@@ -83,9 +91,9 @@ class Player:
         if hand.is_pair():
             # Catchy: A pair of aces will show as [1, 11] or [11, 1]
             sp_card = 11 if hand.cards[0] == 1 else hand.cards[0]
-            key = (c.SPLIT, sp_card, up_card)
-            if key in self.strategy:
-                log(f"act: {key[0]} {key[1]} {key[2]} split")
+            if self.splits[sp_card]:
+                if log.tracing:
+                    log.act(c.SPLIT, sp_card, up_card, 'split')
                 if (sp_card == 11 and self.splits_done < self.max_split_aces) \
                    or (sp_card != 11 and self.splits_done < self.max_splits):
                     self.splits_done += 1
@@ -94,84 +102,83 @@ class Player:
                     self.get_hand(split_card=sp_card)
                     if self.verbose:
                         print("SPLIT")
-                    self.log_hands()
+                    if log.enabled:
+                        self.log_hands()
                     return True
                 else:
-                    log("already at max splits")
+                    if log.enabled:
+                        log.log("already at max splits")
                     return False
             else:  # Did not split
-                log(f"act: {key[0]} {key[1]} {key[2]} no-split")
+                if log.tracing:
+                    log.act(c.SPLIT, sp_card, up_card, 'no-split')
                 return False
         else:
             return False
 
-    def maybe_double_down(self, hand: Hand, up_card: int) -> bool:
+    def maybe_double_down(self, hand: Hand, code: int, up_card: int) -> bool:
         """Double down if the strategy dictates it.
 
         Return True if we doubled, else False.
         """
         if hand.is_split and not self.das_allowed:
-            log("das not allowed")
+            if log.enabled:
+                log.log("das not allowed")
             return False
-        if not hand.is_soft():
-            key = (c.DBL_HARD, hand.value, up_card)
-            if key in self.strategy:
-                log(f"act: {key[0]} {key[1]} {key[2]} double")
-                hand.double()
-                log(f"hand: {hand}")
-                if self.verbose:
-                    print(f"DOUBLE...{hand}")
-                log("")
-                return True
-            else:
-                log(f"act: {key[0]} {key[1]} {key[2]} no-double")
-                return False
+        action = c.DBL_SOFT if hand.is_soft() else c.DBL_HARD
+        if code & DOUBLE:
+            if log.tracing:
+                log.act(action, hand.value, up_card, 'double')
+            hand.double()
+            if log.enabled:
+                log.log(f"hand: {hand}")
+            if self.verbose:
+                print(f"DOUBLE...{hand}")
+            if log.enabled:
+                log.log("")
+            return True
         else:
-            key = (c.DBL_SOFT, hand.value, up_card)
-            if key in self.strategy:
-                log(f"act: {key[0]} {key[1]} {key[2]} double")
-                hand.double()
-                log(f"hand: {hand}")
-                if self.verbose:
-                    print(f"DOUBLE...{hand}")
-                log("")
-                return True
-            else:
-                log(f"act: {key[0]} {key[1]} {key[2]} no-double")
-                return False
+            if log.tracing:
+                log.act(action, hand.value, up_card, 'no-double')
+            return False
 
     def play_normal(self, hand: Hand, up_card: int) -> None:
         """Use the normal hit/stand strategy."""
-        log("hit/stand")
+        if log.enabled:
+            log.log("hit/stand")
         while True:
             # Loop till we stand
             if hand.is_soft():
-                log(f"soft: {hand}")
-                key = (c.HIT_SOFT, hand.value, up_card)
-                if not self.play_strategy(key, hand):
+                if log.enabled:
+                    log.log(f"soft: {hand}")
+                if not self.play_strategy(c.HIT_SOFT, hand, up_card):
                     break
             else:
-                log(f"hard: {hand}")
-                key = (c.HIT_HARD, hand.value, up_card)
-                if not self.play_strategy(key, hand):
+                if log.enabled:
+                    log.log(f"hard: {hand}")
+                if not self.play_strategy(c.HIT_HARD, hand, up_card):
                     break
 
-    def play_strategy(self, key: Tuple[str, int, int], hand: Hand) -> bool:
+    def play_strategy(self, action: str, hand: Hand, up_card: int) -> bool:
         "Return True if we hit and didn't bust, else False."
-        if key in self.strategy:
-            log(f"act: {key[0]} {key[1]} {key[2]} hit")
+        if self.codes[action == c.HIT_SOFT][hand.value] & HIT:
+            if log.tracing:
+                log.act(action, hand.value, up_card, 'hit')
             hand.hit()
             if self.verbose:
                 s = "soft" if hand.is_soft() else ""
                 print(f"hit...{s} {hand}")
             if hand.busted:
-                log(f"BUST: {hand}")
+                if log.enabled:
+                    log.log(f"BUST: {hand}")
                 ret = False
             else:
                 ret = True
         else:
-            log(f"act: {key[0]} {key[1]} {key[2]} stand")
+            if log.tracing:
+                log.act(action, hand.value, up_card, 'stand')
             ret = False
         if not ret:
-            log("")
+            if log.enabled:
+                log.log("")
         return ret
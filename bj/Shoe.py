@@ -1,7 +1,6 @@
-
-
 import random
-from typing import List
+from operator import length_hint
+from typing import Callable, Iterator, List
 
 SUIT = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11]
 DECK = 4 * SUIT
@@ -9,40 +8,95 @@ assert len(DECK) == 52
 
 SEED = 'Blackjack might be a winnable game.'
 
+# Number of shoes to shuffle ahead of time, each time we run out.
+SHUFFLE_BATCH = 32
+
+
+def derive_seed(master: str, *path: object) -> str:
+    """Return the seed for one stream of cards in a run seeded by 'master'.
+
+    'path' names the stream, e.g. derive_seed(seed, 'batch', 2, 'shard', 0)
+    for shard 0 of batch 2 of a parallel run. The seed is the repr() of
+    the tuple of the master seed and the path, which quotes each string
+    part, so no two different (master, path)s make the same seed, even
+    when the master seed has spaces in it. random.Random hashes all of a
+    string seed with SHA-512, so streams with different paths are
+    independent, and the same master seed and path always deal the same
+    cards.
+    """
+    return repr((master,) + path)
+
 
 class Shoe:
-    def __init__(self, decks: int, repeatable=False) -> None:
+    """A shoe of cards, kept as a compact 'bytes' buffer.
+
+    Shoes are shuffled in batches, and each shuffle just switches to the
+    next pre-shuffled buffer. Dealing is the '__next__' of an iterator over
+    the buffer, so there is no Python code run per card unless round
+    tracking is enabled.
+
+    Each Shoe shuffles with its own random.Random, seeded by 'seed', or
+    by SEED if 'repeatable' is set. Otherwise it is seeded by the system,
+    so every shoe, in every process, is different.
+    """
+    def __init__(self, decks: int, repeatable=False, seed=None) -> None:
         self.decks = decks
-        self.shoe = DECK * decks
+        self.cards = DECK * decks
         self.shoe_size = len(DECK) * decks
-        self.next = 0
+        self.shuffled: List[bytes] = []
         self.this_round: List[int] = []
         self.track_rounds = False
+        self.deal: Callable[[], int]
         # print("shoe contains:", len(self.shoe))
-        if repeatable:
-            random.seed(SEED)
+        if seed is None and repeatable:
+            seed = SEED
+        self.rng = random.Random(seed)
+        self.use(bytes(self.cards))
 
     def enable_tracking(self, yesno: bool) -> None:
         self.track_rounds = yesno
+        self.deal = self.deal_tracked if yesno else self.next_card
+
+    def shuffle_batch(self) -> None:
+        "Shuffle SHUFFLE_BATCH shoes, to be used by later calls to shuffle()."
+        batch = []
+        for i in range(SHUFFLE_BATCH):
+            self.rng.shuffle(self.cards)
+            batch.append(bytes(self.cards))
+        batch.reverse()
+        self.shuffled = batch
 
     def shuffle(self) -> None:
         "Shuffle the deck."
-        random.shuffle(self.shoe)
-        self.next = 0
+        if not self.shuffled:
+            self.shuffle_batch()
+        self.use(self.shuffled.pop())
         # print("shuffle...")
 
-    def deal(self) -> int:
-        "Return the next card from the shoe."
-        assert self.next < self.shoe_size
-        c = self.shoe[self.next]
-        self.next += 1
-        if self.track_rounds:
-            self.this_round.append(c)
+    def use(self, shoe: bytes, pos=0) -> None:
+        "Start dealing from 'shoe', at position 'pos' (the top, by default)."
+        self.shoe = shoe
+        self.cards_left: Iterator[int] = iter(shoe[pos:] if pos else shoe)
+        self.next_card = self.cards_left.__next__
+        self.enable_tracking(self.track_rounds)
+
+    def deal_tracked(self) -> int:
+        "Return the next card from the shoe, and remember it."
+        c = self.next_card()
+        self.this_round.append(c)
         return c
 
     def remaining(self) -> int:
         "Return the number of cards still in the shoe."
-        return self.shoe_size - self.next
+        return length_hint(self.cards_left)
+
+    def mark(self) -> int:
+        "Return the position of the next card to be dealt, for rewind()."
+        return len(self.shoe) - self.remaining()
+
+    def rewind(self, pos: int) -> None:
+        "Deal again from position 'pos' of the current shoe."
+        self.use(self.shoe, pos)
 
     def start_round(self) -> None:
         self.this_round = []
@@ -0,0 +1,54 @@
+from typing import Set, Tuple, List
+
+import constants as c
+
+# Hand totals (and pair cards) must be less than this.
+MAX_TOTAL = 32
+# Up-cards run from 2 to 11.
+NUM_UPCARDS = 12
+
+# Decision code bits
+HIT = 1
+DOUBLE = 2
+SURRENDER = 4
+
+
+class Strategy:
+    """A strategy set compiled into dense lookup tables.
+
+    codes[up_card][soft][total] is a decision code for a hand: the OR of
+    HIT, DOUBLE and SURRENDER for the actions the strategy says to take.
+    splits[up_card][pair_card] is 1 if the strategy says to split.
+
+    The Player looks up the rows for the dealer up-card once per round,
+    and then each decision is a single index by hand total.
+    """
+    def __init__(self, keys: Set[Tuple[str, int, int]]) -> None:
+        self.keys = keys
+        self.codes: List[List[bytearray]] = \
+            [[bytearray(MAX_TOTAL), bytearray(MAX_TOTAL)]
+             for up in range(NUM_UPCARDS)]
+        self.splits: List[bytearray] = \
+            [bytearray(MAX_TOTAL) for up in range(NUM_UPCARDS)]
+        for (action, total, up) in keys:
+            assert total < MAX_TOTAL and up < NUM_UPCARDS
+            hard, soft = self.codes[up]
+            if action == c.HIT_HARD:
+                hard[total] |= HIT
+            elif action == c.HIT_SOFT:
+                soft[total] |= HIT
+            elif action == c.DBL_HARD:
+                hard[total] |= DOUBLE
+            elif action == c.DBL_SOFT:
+                soft[total] |= DOUBLE
+            elif action == c.SURRENDER:
+                # Surrender doesn't care if the hand is soft.
+                hard[total] |= SURRENDER
+                soft[total] |= SURRENDER
+            elif action == c.SPLIT:
+                self.splits[up][total] = 1
+            else:
+                assert False
+
+    def __contains__(self, key: Tuple[str, int, int]) -> bool:
+        return key in self.keys
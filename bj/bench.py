@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+"""
+bench.py: Time the parts of the simulator, and check for regressions.
+
+Usage:
+    bench.py [--save] [--tolerance <pct>] [-n <rounds>] [HOUSE-RULES STRATEGY]
+
+Options:
+    -h  --help           Show this screen, and exit.
+    --save               Save the results as the new baseline.
+    --tolerance <pct>    Flag anything this many percent slower than the
+                         baseline. [default: 10]
+    -n <rounds>          Rounds to play for each timing. [default: 20000]
+
+Each benchmark is timed at 1, 3 and 5 seats, with the repeatable shoe:
+Shoe.shuffle, Hand construction, Player.play_hands, Dealer.play_hand
+and a whole Game.play_round. Results, in operations per second, are
+written to bench.json. If bench-baseline.json exists, every result is
+compared with it, and any that got slower than the tolerance are
+flagged. The exit status is 1 if anything regressed.
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+import docopt  # type:ignore
+
+import config
+import Game
+from Hand import Hand
+import parse
+
+RESULTS_FILE = 'bench.json'
+BASELINE_FILE = 'bench-baseline.json'
+SEATS = (1, 3, 5)
+# Each timing is the best of this many runs.
+REPEAT = 3
+
+
+def best_rate(ops: int, fn: Callable[[], None]) -> float:
+    "Run 'fn', which does 'ops' operations, and return the best ops/sec."
+    best = 0.0
+    for i in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = max(best, ops / elapsed)
+    return best
+
+
+def bench_game(game: Game.Game, rounds: int) -> Dict[str, float]:
+    "Time each part of a round, on an already created Game."
+    shoe = game.shoe
+    players = game.players
+    dealer = game.dealer
+
+    def shuffle() -> None:
+        for i in range(rounds):
+            shoe.shuffle()
+
+    def hands() -> None:
+        h = Hand(shoe)
+        for i in range(rounds):
+            if shoe.remaining() < 52:
+                shoe.shuffle()
+            h.reset()
+
+    def play_hands() -> None:
+        for i in range(rounds):
+            if shoe.remaining() < game.shuffle_point:
+                shoe.shuffle()
+            for p in players:
+                p.get_hand()
+            dealer.get_hand()
+            up = dealer.up_card()
+            for p in players:
+                p.play_hands(up)
+                p.end_round()
+
+    def dealer_hands() -> None:
+        for i in range(rounds):
+            if shoe.remaining() < 52:
+                shoe.shuffle()
+            dealer.get_hand()
+            dealer.play_hand()
+
+    def whole_rounds() -> None:
+        game.play_rounds(rounds)
+
+    # Player.play_hands includes dealing, as a round does.
+    return {'Shoe.shuffle': best_rate(rounds, shuffle),
+            'Hand': best_rate(rounds, hands),
+            'Player.play_hands': best_rate(rounds * len(players),
+                                           play_hands),
+            'Dealer.play_hand': best_rate(rounds, dealer_hands),
+            'Game.play_round': best_rate(rounds, whole_rounds)}
+
+
+def run(rules: Dict[str, int], strategy_file: str,
+        rounds: int) -> Dict[str, float]:
+    "Run every benchmark, and return {'name/seats': ops per second}."
+    strategy = parse.parse_strategy(strategy_file)
+    results = {}
+    for seats in SEATS:
+        game = Game.Game(strategy=strategy,
+                         players=seats,
+                         rules=rules,
+                         repeatable=True)
+        for name, rate in bench_game(game, rounds).items():
+            results[f"{name}/{seats}"] = rate
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float],
+            tolerance: float) -> bool:
+    "Print each result against the baseline. Return True if any regressed."
+    regressed = False
+    for name, rate in results.items():
+        if name not in baseline:
+            print(f"{name:24} {rate:12.0f}/s")
+            continue
+        change = 100 * (rate - baseline[name]) / baseline[name]
+        flag = ''
+        if change < -tolerance:
+            flag = '  REGRESSION'
+            regressed = True
+        print(f"{name:24} {rate:12.0f}/s {change:+7.1f}%{flag}")
+    return regressed
+
+
+def main() -> None:
+    args = docopt.docopt(__doc__)
+    rules_file = args['HOUSE-RULES'] or 'data/house.cfg'
+    strategy_file = args['STRATEGY'] or 'data/basic-double-split.txt'
+    rules = config.load_config(rules_file)
+    results = run(rules, strategy_file, int(args['-n']))
+    record = {'time': time.asctime(),
+              'rules': rules_file,
+              'strategy': strategy_file,
+              'results': results}
+    with open(RESULTS_FILE, 'wt') as f:
+        json.dump(record, f, indent=2)
+
+    baseline: Dict[str, float] = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'rt') as f:
+            baseline = json.load(f)['results']
+    regressed = compare(results, baseline, float(args['--tolerance']))
+    if args['--save']:
+        with open(BASELINE_FILE, 'wt') as f:
+            json.dump(record, f, indent=2)
+        print(f"saved baseline in {BASELINE_FILE}")
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
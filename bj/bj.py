@@ -4,44 +4,93 @@
 bj.py: Blackjack simulator, for studying the game.
 
 Usage:
-    bj.py [-d <flags>] [-v] [-t] [-n <rounds>] [-s <seats>] [--test] \
-HOUSE-RULES STRATEGY
+    bj.py [-d <flags>] [-v] [-t] [-b] [-n <rounds>] [-s <seats>] \
+[--test | --seed <seed>] [--workers <n> | --vector] [--batch <rounds>] \
+[--precision <se>] [--count <system>] [--ramp <file>] [--db <file>] \
+[--report] [--infinite] [--profile] HOUSE-RULES STRATEGY
 
 Options:
     -h  --help           Show this screen, and exit.
     --version            Show version, and exit.
     -v                   Be verbose.
     -t                   Trace all plays to log file.
+    -b                   Trace player decisions to trace.bin, in binary.
     -d <flags>           Set debug flags.
     -n <rounds>          Number of rounds to play.
     -s <seats>           Number of players to play.
     --test               Use repeatable card sequence.
+    --seed <seed>        Use the repeatable card sequence from this seed.
+                         Worker shards get seeds derived from it.
+    --workers <n>        Split the rounds across n worker processes.
+    --vector             Play rounds x seats heads-up hands in lockstep,
+                         with NumPy, rounded up to a whole batch.
+    --batch <rounds>     Rounds between updates of the running EV.
+                         [default: 10000]
+    --precision <se>     Stop once the standard error of the EV per hand
+                         is at most <se> percent. -n is then the most
+                         rounds to play.
+    --count <system>     Count cards with <system> (hilo, ko, hiopt1 or
+                         zen), and play the strategy's deviations.
+    --ramp <file>        Bet by true count, from this bet ramp file.
+                         Needs --count.
+    --db <file>          Add this run to the results store.
+                         [default: runs.db]
+    --report             Write EV by starting hand, up-card and action
+                         to report.txt.
+    --infinite           Deal from an infinite number of decks. num_decks
+                         is ignored, and there are no shuffles.
+    --profile            Time each phase of the rounds, and print where
+                         the time went. With workers, the times are
+                         added up across them. Not with --vector.
 """
 
-from typing import Dict, Any
+import multiprocessing
+import sys
+from typing import Dict, Any, List, Optional, Set, Tuple
 
 import docopt  # type:ignore
 
+import BatchGame
 import config
+import count
 import Game
 import log
+import parallel
 import parse
+import report
+import results
+import running
+from Shoe import SEED
 
 
 # Global parameters
 
 VERSION = '0.10'
 LOG_FILE = 'trace.txt'
+ACT_FILE = 'trace.bin'
 STATS_FILE = 'stats.txt'
+BATCH_FILE = 'batches.txt'
+REPORT_FILE = 'report.txt'
 
 
 class Globals:
     verbose: bool
     trace: bool
+    binary_trace: bool
     test: bool
+    seed: Optional[str]
     debug: str
     num_rounds: int
     num_players: int
+    workers: int
+    vector: bool
+    batch: int
+    precision: float
+    count: str
+    ramp: str
+    report: bool
+    infinite: bool
+    profile: bool
 
     rules: Dict[str, int]
 
@@ -53,10 +102,21 @@ g = Globals()
 # Set from command line flags
 g.verbose = False
 g.trace = False
+g.binary_trace = False
 g.test = False
+g.seed = None
 g.debug = ''
 g.num_rounds = 1
 g.num_players = 1
+g.workers = 1
+g.vector = False
+g.batch = 10000
+g.precision = 0.0
+g.count = ''
+g.ramp = ''
+g.report = False
+g.infinite = False
+g.profile = False
 
 g.rules = {}
 
@@ -70,8 +130,15 @@ def save_cmd_line(args: Dict[str, Any]) -> None:
         g.verbose = True
     if args['-t']:
         g.trace = True
+    if args['-b']:
+        g.binary_trace = True
     if args['--test']:
         g.test = True
+        g.seed = SEED
+    if args['--seed']:
+        g.seed = args['--seed']
+    if args['--vector']:
+        g.vector = True
     flags = args['-d']
     if flags:
         g.debug = flags
@@ -81,6 +148,23 @@ def save_cmd_line(args: Dict[str, Any]) -> None:
     n = args['-s']
     if n:
         g.num_players = int(n)
+    n = args['--workers']
+    if n:
+        g.workers = int(n)
+    g.batch = int(args['--batch'])
+    p = args['--precision']
+    if p:
+        g.precision = float(p)
+    if args['--count']:
+        g.count = args['--count']
+    if args['--ramp']:
+        g.ramp = args['--ramp']
+    if args['--report']:
+        g.report = True
+    if args['--infinite']:
+        g.infinite = True
+    if args['--profile']:
+        g.profile = True
 
 
 def read_config(cfg_file: str) -> None:
@@ -89,36 +173,160 @@ def read_config(cfg_file: str) -> None:
     log.log(f"config: {g.rules}")
 
 
+def play_serial(strategy: Set[Tuple[str, int, int]],
+                stream: running.StatsStream,
+                count_play: Optional[count.CountPlay],
+                hand_report: Optional[report.HandReport],
+                profile: Optional[Game.Profile]) -> Game.Statistics:
+    "Play the rounds in this process, a batch at a time."
+    game = Game.Game(strategy=strategy,
+                     players=g.num_players,
+                     seed=g.seed,
+                     rules=g.rules,
+                     verbose=g.verbose,
+                     count=count_play,
+                     report=hand_report,
+                     infinite=g.infinite,
+                     profile=profile)
+    left = g.num_rounds
+    while left > 0:
+        n = min(g.batch, left)
+        game.play_rounds(n)
+        left -= n
+        if stream.add(game.st):
+            break
+    return game.st
+
+
+def play_parallel(strategy: Set[Tuple[str, int, int]],
+                  stream: running.StatsStream,
+                  count_play: Optional[count.CountPlay],
+                  hand_report: Optional[report.HandReport],
+                  profile: Optional[Game.Profile]) -> Game.Statistics:
+    "Play each batch of rounds split across the worker processes."
+    st = Game.Statistics()
+    with multiprocessing.Pool(g.workers) as pool:
+        left = g.num_rounds
+        batch = 0
+        while left > 0:
+            n = min(g.batch, left)
+            st.merge(parallel.play_parallel(pool, g.rules, strategy,
+                                            g.num_players, n, g.workers,
+                                            seed=g.seed,
+                                            batch=batch,
+                                            count_play=count_play,
+                                            hand_report=hand_report,
+                                            infinite=g.infinite,
+                                            profile=profile))
+            left -= n
+            batch += 1
+            if stream.add(st):
+                break
+    return st
+
+
+def play_vector(strategy: Set[Tuple[str, int, int]],
+                stream: running.StatsStream) -> Game.Statistics:
+    "Play rounds x seats heads-up hands with the NumPy batch simulator."
+    hands = g.num_rounds * g.num_players
+    lanes = min(BatchGame.LANES, hands)
+    game = BatchGame.BatchGame(lanes=lanes,
+                               rules=g.rules,
+                               strategy=strategy,
+                               seed=g.seed)
+    for i in range(-(-hands // lanes)):
+        game.play_round()
+        if stream.add(game.st):
+            break
+    return game.st
+
+
+def save_run(fname: str, st: Game.Statistics, strategy_name: str,
+             strategy: Set[Tuple[str, int, int]],
+             deviations: List[parse.Deviation]) -> None:
+    "Add this run to the results store."
+    if g.workers > 1:
+        mode = f"workers {g.workers}"
+    elif g.vector:
+        mode = "vector"
+    else:
+        mode = "serial"
+    if g.infinite:
+        mode += " infinite"
+    if g.count:
+        mode += f" count {g.count}"
+        if g.ramp:
+            mode += f" ramp {g.ramp}"
+    store = results.RunStore(fname)
+    store.add(st, strategy_name, strategy, g.rules, g.num_players,
+              seed=g.seed, mode=mode,
+              deviations=deviations if g.count else [])
+    store.close()
+
+
 def main() -> None:
     args = docopt.docopt(__doc__, version=VERSION)
     save_cmd_line(args)
     if g.verbose:
         print("Version:", VERSION)
         print(args)
+    if (g.trace or g.binary_trace) and (g.workers > 1 or g.vector):
+        sys.exit('bj.py: -t and -b need a single worker, and no --vector')
+    if (g.count or g.report) and g.vector:
+        sys.exit('bj.py: --count and --report do not work with --vector')
+    if g.profile and g.vector:
+        sys.exit('bj.py: --profile does not work with --vector')
+    if g.infinite and (g.count or g.vector):
+        sys.exit('bj.py: --infinite does not work with --count or --vector')
+    if g.ramp and not g.count:
+        sys.exit('bj.py: --ramp needs --count')
+    if g.count and g.count not in count.SYSTEMS:
+        sys.exit(f'bj.py: unknown counting system: {g.count}')
     if g.trace:
         log.log_open(LOG_FILE)
+    if g.binary_trace:
+        log.act_open(ACT_FILE)
 
     read_config(args['HOUSE-RULES'])
-    strategy = parse.parse_strategy(args['STRATEGY'])
+    deviations: List[parse.Deviation] = []
+    strategy = parse.parse_strategy(args['STRATEGY'], deviations)
+    count_play = None
+    if g.count:
+        ramp = count.load_ramp(g.ramp) if g.ramp else {}
+        count_play = count.CountPlay(strategy, deviations, ramp, Game.BET,
+                                     system=g.count)
 
     # ----------- The interesting stuff goes here.
 
-    game = Game.Game(strategy=strategy,
-                     players=g.num_players,
-                     repeatable=g.test,
-                     rules=g.rules,
-                     verbose=g.verbose)
-
-    for i in range(g.num_rounds):
-        log.log(f"round: {i + 1}")
-        game.play_round()
-
-    game.write_stats(STATS_FILE, args['STRATEGY'])
+    stream = running.StatsStream(BATCH_FILE, args['STRATEGY'], Game.BET,
+                                 target=g.precision)
+    hand_report = report.HandReport() if g.report else None
+    profile = Game.Profile() if g.profile else None
+    if g.workers > 1:
+        st = play_parallel(strategy, stream, count_play, hand_report,
+                           profile)
+    elif g.vector:
+        st = play_vector(strategy, stream)
+    else:
+        st = play_serial(strategy, stream, count_play, hand_report,
+                         profile)
+    stream.close()
+    log.log("writing stats")
+    st.write(STATS_FILE, args['STRATEGY'])
+    if g.verbose or g.precision:
+        print(f"%ev/hand: {running.interval(*st.ev())}")
+    save_run(args['--db'], st, args['STRATEGY'], strategy, deviations)
+    if hand_report is not None:
+        hand_report.write(REPORT_FILE, args['STRATEGY'], Game.BET)
+    if profile is not None:
+        profile.write()
 
     # -----------
 
     if g.trace:
         log.log_close()
+    if g.binary_trace:
+        log.act_close()
 
 
 if __name__ == '__main__':
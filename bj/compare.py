@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+"""
+compare.py: Compare strategies by playing them on the same cards.
+
+Usage:
+    compare.py [--test] [-n <rounds>] [-s <seats>] HOUSE-RULES STRATEGY...
+
+Options:
+    -h  --help           Show this screen, and exit.
+    -n <rounds>          Number of rounds to play. [default: 100000]
+    -s <seats>           Number of players at the table. [default: 1]
+    --test               Use repeatable card sequence.
+
+Every strategy plays every round, one after another, from the same
+position in one shared shoe: the shoe is rewound before each strategy
+plays. Then the shoe moves on past the most cards any of them used.
+
+Each strategy after the first is reported against the first, as the
+mean of the per-round differences in net win, and the standard error of
+that mean. Because both played the same cards, most of the luck cancels
+out. For comparison, the standard error two independent runs of the
+same length would give is shown too.
+"""
+
+import math
+import sys
+from typing import List, Tuple
+
+import docopt  # type:ignore
+
+import config
+import Game
+import parse
+import running
+from Shoe import Shoe
+
+
+class Comparison:
+    "Play several Games on one shoe, and keep the paired differences."
+    def __init__(self, rules, strategies, players=1, repeatable=False,
+                 penetration=0.25) -> None:
+        self.shoe = Shoe(rules['num_decks'], repeatable=repeatable)
+        self.shuffle_point = int(rules['num_decks'] * 52 * penetration)
+        # The games get the same shuffle point, so after Comparison has
+        # shuffled, none of them reshuffles the shoe in the middle.
+        self.games = [Game.Game(players=players,
+                                rules=rules,
+                                strategy=s,
+                                penetration=penetration,
+                                shoe=self.shoe) for s in strategies]
+        self.shoe.shuffle()
+        # Sums of the differences from the first strategy, per round
+        self.diff_sum = [0] * len(strategies)
+        self.diff_sum_sq = [0] * len(strategies)
+
+    def play_round(self) -> None:
+        "Play one round with every strategy, from the same card."
+        shoe = self.shoe
+        if shoe.remaining() < self.shuffle_point:
+            shoe.shuffle()
+        start = shoe.mark()
+        end = start
+        nets: List[int] = []
+        for game in self.games:
+            shoe.rewind(start)
+            st = game.st
+            net = st.total_won - st.total_lost
+            game.play_round()
+            nets.append(st.total_won - st.total_lost - net)
+            end = max(end, shoe.mark())
+        shoe.rewind(end)
+        for n, net in enumerate(nets):
+            d = net - nets[0]
+            self.diff_sum[n] += d
+            self.diff_sum_sq[n] += d * d
+
+    def difference(self, n: int) -> Tuple[float, float]:
+        "Return EV per hand of strategy n minus the first, and its SE."
+        st = self.games[n].st
+        return running.ev_stderr(st.rounds_played, st.hands_played,
+                                 self.diff_sum[n], self.diff_sum_sq[n],
+                                 Game.BET)
+
+
+def main() -> None:
+    args = docopt.docopt(__doc__)
+    names = args['STRATEGY']
+    if len(names) < 2:
+        sys.exit('compare.py: needs at least two strategies')
+    rules = config.load_config(args['HOUSE-RULES'])
+    cmp = Comparison(rules,
+                     [parse.parse_strategy(s) for s in names],
+                     players=int(args['-s']),
+                     repeatable=args['--test'])
+    for i in range(int(args['-n'])):
+        cmp.play_round()
+
+    base_se = cmp.games[0].st.ev()[1]
+    for n, (name, game) in enumerate(zip(names, cmp.games)):
+        ev, se = game.st.ev()
+        print(name)
+        print(f"  %ev/hand:  {running.interval(ev, se)}")
+        if n > 0:
+            diff, diff_se = cmp.difference(n)
+            print(f"  vs {names[0]}: {running.interval(diff, diff_se)}")
+            print(f"  independent runs would give +/- "
+                  f"{math.sqrt(base_se ** 2 + se ** 2):.3}")
+
+
+if __name__ == '__main__':
+    main()
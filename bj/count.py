@@ -0,0 +1,149 @@
+"""
+count.py: Card counting, bet ramps, and count-based strategy deviations.
+
+A counting system gives each card value a tag. Rather than adding up tags
+as each card is dealt, Count translates each new shoe into its tags and
+keeps the running count after every card, all in C. The running count
+at any point is then one list lookup, at the position of the next card,
+so counting costs nothing per card dealt.
+
+The true count is the running count per deck left in the shoe, rounded
+down. CountPlay uses the true count at the start of each round to pick
+the bet, from a bet ramp, and the strategy, which is the base strategy
+plus the deviations whose condition holds at that count. Both are worked
+out ahead of time for every true count from TC_MIN to TC_MAX, and counts
+outside that range use the nearest end of it.
+"""
+
+import operator
+from itertools import accumulate
+from typing import Dict, List, Set, Tuple
+
+import parse
+from Shoe import Shoe
+from Strategy import Strategy
+
+# Tags for each card value, 2 through 11 (ace)
+SYSTEMS = {
+    'hilo':   {2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1,
+               11: -1},
+    'ko':     {2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 1, 8: 0, 9: 0, 10: -1,
+               11: -1},
+    'hiopt1': {2: 0, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1,
+               11: 0},
+    'zen':    {2: 1, 3: 1, 4: 2, 5: 2, 6: 2, 7: 1, 8: 0, 9: 0, 10: -2,
+               11: -1},
+}
+
+# Added to each tag so it fits in a byte.
+OFFSET = 4
+
+TC_MIN = -10
+TC_MAX = 10
+
+OPS = {'<': operator.lt,
+       '<=': operator.le,
+       '>': operator.gt,
+       '>=': operator.ge,
+       '==': operator.eq}
+
+
+class Count:
+    "Keep the count of the cards dealt from a shoe, by counting system."
+    def __init__(self, system='hilo') -> None:
+        tags = SYSTEMS[system]
+        self.table = bytes(tags.get(n, 0) + OFFSET for n in range(256))
+        self.counted = b''
+        # prefix[n] is the sum of the first n offset tags.
+        self.prefix: List[int] = [0]
+
+    def new_shoe(self, cards: bytes) -> None:
+        "Count all of a new shoe now."
+        self.counted = cards
+        self.prefix = list(accumulate(cards.translate(self.table),
+                                      initial=0))
+
+    def running_count(self, shoe: Shoe) -> int:
+        "Return the running count of the cards dealt from 'shoe'."
+        if shoe.shoe is not self.counted:
+            self.new_shoe(shoe.shoe)
+        pos = shoe.mark()
+        return self.prefix[pos] - OFFSET * pos
+
+    def true_count(self, shoe: Shoe) -> int:
+        "Return the running count per deck left in 'shoe', rounded down."
+        # This is once a round, so running_count() is done inline.
+        cards = shoe.shoe
+        if cards is not self.counted:
+            self.new_shoe(cards)
+        left = operator.length_hint(shoe.cards_left)
+        if left == 0:
+            return 0
+        pos = len(cards) - left
+        return (self.prefix[pos] - OFFSET * pos) * 52 // left
+
+
+def load_ramp(fname: str) -> Dict[int, int]:
+    """Return the bet ramp in file 'fname', as {true count: units}.
+
+    The file has lines like 'tc2 = 4', in the house rules format. A true
+    count below the lowest one listed bets as the lowest, and every other
+    count bets as the highest listed count not above it.
+    """
+    ramp = {}
+    with open(fname, 'rt') as f:
+        for line in f:
+            if line.startswith('#') or len(line.strip()) == 0:
+                continue
+            name, value = line.split('=')
+            name = name.strip()
+            assert name.startswith('tc'), f"bad ramp line: {line}"
+            ramp[int(name[2:])] = int(value.strip())
+    return ramp
+
+
+def ramp_units(ramp: Dict[int, int], tc: int) -> int:
+    "Return the units to bet at true count 'tc'."
+    if not ramp:
+        return 1
+    counts = sorted(ramp)
+    units = ramp[counts[0]]
+    for n in counts:
+        if n <= tc:
+            units = ramp[n]
+    return units
+
+
+class CountPlay:
+    "Choose the bet and strategy for each round by the true count."
+    def __init__(self,
+                 keys: Set[Tuple[str, int, int]],
+                 deviations: List[parse.Deviation],
+                 ramp: Dict[int, int],
+                 bet: int,
+                 system='hilo') -> None:
+        self.count = Count(system)
+        self.bets: List[int] = []
+        self.strategies: List[Strategy] = []
+        compiled: Dict[frozenset, Strategy] = {}
+        for tc in range(TC_MIN, TC_MAX + 1):
+            self.bets.append(bet * ramp_units(ramp, tc))
+            tc_keys = set(keys)
+            # Deviations only add keys. See parse.parse_strategy().
+            for op, n, dev_keys in deviations:
+                if OPS[op](tc, n):
+                    tc_keys |= dev_keys
+            frozen = frozenset(tc_keys)
+            if frozen not in compiled:
+                compiled[frozen] = Strategy(tc_keys)
+            self.strategies.append(compiled[frozen])
+
+    def start_round(self, shoe: Shoe) -> Tuple[int, Strategy, int]:
+        "Return the true count, and the strategy and bet to play at it."
+        tc = self.count.true_count(shoe)
+        n = tc - TC_MIN
+        if n < 0:
+            n = 0
+        elif n > TC_MAX - TC_MIN:
+            n = TC_MAX - TC_MIN
+        return tc, self.strategies[n], self.bets[n]
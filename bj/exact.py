@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+
+"""
+exact.py: Compute the expected value of a strategy, without simulating.
+
+Usage:
+    exact.py [-v] HOUSE-RULES STRATEGY
+
+Options:
+    -h  --help           Show this screen, and exit.
+    -v                   Show the EV of each decision, for each hand.
+
+The dealer's final total is computed exactly for each up-card, by
+recursion over the cards left in the shoe, under the 'hit_s17' rule.
+The player's cards are drawn from the shoe less the up-card, without
+removal. A split hand may re-split, and is then treated as if it had
+the remaining splits to itself.
+
+The decisions are made in the same order as Player.play_hands, so the
+result can be compared with the '%win' of a long bj.py run.
+"""
+
+from typing import Dict, List, Tuple
+
+import docopt  # type:ignore
+
+import config
+import parse
+from Shoe import SUIT
+from Strategy import Strategy, HIT, DOUBLE, SURRENDER
+
+RANKS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11)
+
+# Dealer outcomes: final totals 17 to 21, then bust.
+BUST = 5
+Outcomes = Tuple[float, float, float, float, float, float]
+# (expected win, expected amount bet), both in units of the initial bet.
+Value = Tuple[float, float]
+
+
+def shoe_counts(decks: int) -> Tuple[int, ...]:
+    "Return the number of cards of each rank in a full shoe."
+    return tuple(4 * decks * SUIT.count(r) for r in RANKS)
+
+
+def add_card(total: int, soft: int, card: int) -> Tuple[int, int]:
+    """Add 'card' to a hand, the way Hand.hit does.
+
+    'soft' is the number of aces counted as 11.
+    """
+    total += card
+    if card == 11:
+        soft += 1
+    if total > 21 and soft:
+        total -= 10
+        soft -= 1
+    return total, soft
+
+
+class DealerOdds:
+    "The dealer's final-total distribution, memoized by shoe contents."
+
+    def __init__(self, hit_s17: int) -> None:
+        self.hit_s17 = hit_s17
+        self.memo: Dict[Tuple[int, int, Tuple[int, ...]], Outcomes] = {}
+
+    def final(self, total: int, soft: int,
+              counts: Tuple[int, ...]) -> Outcomes:
+        "Return the outcome probabilities for a dealer hand."
+        if total > 21:
+            return (0.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+        if total > 17 or (total == 17 and not (soft and self.hit_s17)):
+            result = [0.0] * 6
+            result[total - 17] = 1.0
+            return tuple(result)  # type: ignore
+        key = (total, soft, counts)
+        if key in self.memo:
+            return self.memo[key]
+        result = [0.0] * 6
+        n = sum(counts)
+        for i, ct in enumerate(counts):
+            if ct:
+                left = counts[:i] + (ct - 1,) + counts[i + 1:]
+                t, s = add_card(total, soft, RANKS[i])
+                p = ct / n
+                for j, x in enumerate(self.final(t, s, left)):
+                    result[j] += p * x
+        self.memo[key] = tuple(result)  # type: ignore
+        return self.memo[key]
+
+    def up_card(self, up: int,
+                counts: Tuple[int, ...]) -> Tuple[float, Outcomes]:
+        """Return P(dealer blackjack), and the outcomes if not blackjack.
+
+        'counts' is the shoe with the up-card already removed. The dealer
+        peeks, so the hole card is drawn from the cards that don't make
+        a blackjack.
+        """
+        bj_card = {10: 11, 11: 10}.get(up, 0)
+        n = sum(counts)
+        n_ok = n - (counts[bj_card - 2] if bj_card else 0)
+        result = [0.0] * 6
+        for i, ct in enumerate(counts):
+            if ct and RANKS[i] != bj_card:
+                left = counts[:i] + (ct - 1,) + counts[i + 1:]
+                t, s = add_card(up, int(up == 11), RANKS[i])
+                p = ct / n_ok
+                for j, x in enumerate(self.final(t, s, left)):
+                    result[j] += p * x
+        return 1 - n_ok / n, tuple(result)  # type: ignore
+
+
+class PlayerOdds:
+    "Expected values of the player's choices against one up-card."
+
+    def __init__(self, strategy: Strategy, rules: Dict[str, int],
+                 up: int, probs: List[float], dealer: Outcomes) -> None:
+        self.codes = strategy.codes[up]
+        self.splits = strategy.splits[up]
+        self.max_splits = rules['max_split_hands'] - 1
+        self.max_split_aces = rules['max_split_aces'] - 1
+        self.can_hit_split_aces = rules['can_hit_split_aces']
+        self.das_allowed = rules['das_allowed']
+        self.probs = probs
+        self.dealer = dealer
+        self.memo: Dict[Tuple[int, int], Value] = {}
+
+    def stand(self, total: int) -> float:
+        "Return the EV of standing on 'total'."
+        if total > 21:
+            return -1.0
+        d = self.dealer
+        if total < 17:
+            return 2 * d[BUST] - 1
+        win = d[BUST] + sum(d[:total - 17])
+        lose = sum(d[total - 16:BUST])
+        return win - lose
+
+    def hit(self, total: int, soft: int) -> Value:
+        "Return the value of taking a card, then following the strategy."
+        ev = bet = 0.0
+        for p, card in zip(self.probs, RANKS):
+            t, s = add_card(total, soft, card)
+            e, b = self.play(t, s)
+            ev += p * e
+            bet += p * b
+        return ev, bet
+
+    def play(self, total: int, soft: int) -> Value:
+        "Return the value of hitting or standing, as Player.play_normal."
+        if total > 21:
+            return -1.0, 1.0
+        key = (total, soft)
+        if key not in self.memo:
+            if self.codes[soft > 0][total] & HIT:
+                self.memo[key] = self.hit(total, soft)
+            else:
+                self.memo[key] = (self.stand(total), 1.0)
+        return self.memo[key]
+
+    def double(self, total: int, soft: int) -> Value:
+        "Return the value of doubling down."
+        ev = 0.0
+        for p, card in zip(self.probs, RANKS):
+            ev += p * self.stand(add_card(total, soft, card)[0])
+        return 2 * ev, 2.0
+
+    def split(self, card: int, splits_done: int) -> Value:
+        "Return the value of splitting a pair of 'card's."
+        ev = bet = 0.0
+        for p, c in zip(self.probs, RANKS):
+            total, soft = add_card(card, int(card == 11), c)
+            if card == 11 and not self.can_hit_split_aces:
+                e, b = self.stand(total), 1.0
+            else:
+                pair = card if c == card else 0
+                e, b = self.decide(total, soft, pair, splits_done, True)
+            ev += p * e
+            bet += p * b
+        return 2 * ev, 2 * bet
+
+    def can_split(self, card: int, splits_done: int) -> bool:
+        "Return True if the rules allow another split of 'card'."
+        if card == 11:
+            return splits_done < self.max_split_aces
+        return splits_done < self.max_splits
+
+    def decide(self, total: int, soft: int, pair: int, splits_done: int,
+               is_split: bool) -> Value:
+        "Return the value of a two-card hand, as Player.play_hands."
+        code = self.codes[soft > 0][total]
+        if code & SURRENDER:
+            return -0.5, 1.0
+        if pair and self.splits[pair] and self.can_split(pair, splits_done):
+            return self.split(pair, splits_done + 1)
+        if code & DOUBLE and not (is_split and not self.das_allowed):
+            return self.double(total, soft)
+        return self.play(total, soft)
+
+    def choices(self, total: int, soft: int, pair: int) -> Dict[str, Value]:
+        "Return the value of every choice for a starting hand."
+        v = {'stand': (self.stand(total), 1.0),
+             'hit': self.hit(total, soft),
+             'double': self.double(total, soft),
+             'surrender': (-0.5, 1.0)}
+        if pair:
+            v['split'] = self.split(pair, 1)
+        return v
+
+
+def starting_hands() -> List[Tuple[int, int]]:
+    "Return every ordered pair of first two cards."
+    return [(c1, c2) for c1 in RANKS for c2 in RANKS]
+
+
+def two_cards(c1: int, c2: int) -> Tuple[int, int, int]:
+    "Return (total, soft, pair card) for a starting hand."
+    total, soft = add_card(c1, int(c1 == 11), c2)
+    return total, soft, c1 if c1 == c2 else 0
+
+
+def hand_name(total: int, soft: int, pair: int) -> str:
+    "Name a starting hand, like 'hard 16', 'soft 18' or 'pair 8'."
+    if pair:
+        return f"pair {pair}"
+    return f"{'soft' if soft else 'hard'} {total}"
+
+
+def strategy_ev(strategy: Strategy, rules: Dict[str, int],
+                verbose=False) -> Value:
+    """Return the expected win and amount bet per hand dealt.
+
+    If 'verbose' is set, print the value of each choice for each
+    starting hand and up-card. The strategy's choice is marked with '*'.
+    """
+    counts = shoe_counts(rules['num_decks'])
+    n = sum(counts)
+    dealer = DealerOdds(rules['hit_s17'])
+    total_ev = total_bet = 0.0
+    for i, up in enumerate(RANKS):
+        left = counts[:i] + (counts[i] - 1,) + counts[i + 1:]
+        probs = [ct / (n - 1) for ct in left]
+        p_bj, outcomes = dealer.up_card(up, left)
+        player = PlayerOdds(strategy, rules, up, probs, outcomes)
+        ev = bet = 0.0
+        seen = set()
+        for c1, c2 in starting_hands():
+            p = probs[c1 - 2] * probs[c2 - 2]
+            total, soft, pair = two_cards(c1, c2)
+            if total == 21:
+                e, b = (1 - p_bj) * 1.5, 1.0
+            else:
+                e, b = player.decide(total, soft, pair, 0, False)
+                e = (1 - p_bj) * e - p_bj
+                b = (1 - p_bj) * b + p_bj
+                if verbose and (total, soft, pair) not in seen:
+                    seen.add((total, soft, pair))
+                    show_choices(player, up, total, soft, pair,
+                                 player.decide(total, soft, pair, 0, False))
+            ev += p * e
+            bet += p * b
+        p_up = counts[i] / n
+        total_ev += p_up * ev
+        total_bet += p_up * bet
+    return total_ev, total_bet
+
+
+def show_choices(player: PlayerOdds, up: int, total: int, soft: int,
+                 pair: int, chosen: Value) -> None:
+    "Print the EV of each choice for one starting hand and up-card."
+    fields = []
+    for name, (e, b) in player.choices(total, soft, pair).items():
+        mark = '*' if (e, b) == chosen else ' '
+        fields.append(f"{name} {e:+.4f}{mark}")
+    print(f"{hand_name(total, soft, pair):8} vs {up:2}: " + '  '.join(fields))
+
+
+def main() -> None:
+    args = docopt.docopt(__doc__)
+    rules = config.load_config(args['HOUSE-RULES'])
+    strategy = Strategy(parse.parse_strategy(args['STRATEGY']))
+    ev, bet = strategy_ev(strategy, rules, verbose=args['-v'])
+    print("strategy", args['STRATEGY'])
+    print(f"ev/hand: {100 * ev:6.4}")
+    print(f"bet/hand: {bet:6.4}")
+    print(f"%win: {100 * ev / bet:5.4}")
+
+
+if __name__ == '__main__':
+    main()
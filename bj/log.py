@@ -1,24 +1,86 @@
 
+# Trace points are written as:
+#
+#     if log.enabled:
+#         log.log(f"...")
+#
+# so that when no trace file is open, the message is never formatted.
+# 'enabled' is True exactly when 'log_file' is open.
+#
+# Player decisions are written with act(), guarded by 'tracing', which is
+# True when either the text trace or the binary trace is open.
+#
+# The binary trace has one fixed-size record per decision: the action,
+# the hand total (or pair card, to split), the dealer up-card, and 1 if
+# the action was taken or 0 if not, a byte each. The action is an index
+# in ACTIONS.
+
+import constants as c
+
+enabled = False
+tracing = False
 log_file = None
+act_file = None
+act_buf = bytearray()
+
+ACTIONS = (c.HIT_HARD, c.HIT_SOFT, c.DBL_HARD, c.DBL_SOFT, c.SPLIT)
+ACTION_CODES = {action: n for n, action in enumerate(ACTIONS)}
+TAKEN = {'hit': 1, 'stand': 0,
+         'double': 1, 'no-double': 0,
+         'split': 1, 'no-split': 0}
+RECORD_SIZE = 4
+# Write the binary trace in chunks of about this many bytes.
+FLUSH_SIZE = 1 << 20
 
 
 def log_open(name: str) -> None:
-    global log_file
+    global log_file, enabled, tracing
     log_file = open(name, 'wt')
+    enabled = tracing = True
     log('START log')
 
 
 def log_close() -> None:
-    global log_file
+    global log_file, enabled, tracing
     if log_file:
         log('END log')
         log_file.close()
         log_file = None
+        enabled = False
+        tracing = act_file is not None
     else:
         assert False
 
 
+def act_open(name: str) -> None:
+    "Open the binary trace of player decisions."
+    global act_file, tracing
+    act_file = open(name, 'wb')
+    tracing = True
+
+
+def act_close() -> None:
+    global act_file, tracing
+    assert act_file
+    act_file.write(act_buf)
+    act_buf.clear()
+    act_file.close()
+    act_file = None
+    tracing = enabled
+
+
 def log(s: str) -> None:
     global log_file
     if log_file:
         print(s, file=log_file)
+
+
+def act(action: str, total: int, up: int, decision: str) -> None:
+    "Trace one player decision, to whichever traces are open."
+    if log_file:
+        print(f"act: {action} {total} {up} {decision}", file=log_file)
+    if act_file:
+        act_buf.extend((ACTION_CODES[action], total, up, TAKEN[decision]))
+        if len(act_buf) >= FLUSH_SIZE:
+            act_file.write(act_buf)
+            act_buf.clear()
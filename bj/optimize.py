@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+"""
+optimize.py: Improve a strategy, one cell of the table at a time.
+
+Usage:
+    optimize.py [-n <shoes>] [--passes <n>] [--workers <n>] [-z <z>] \
+[-o <file>] HOUSE-RULES STRATEGY
+
+Options:
+    -h  --help           Show this screen, and exit.
+    -n <shoes>           Shoes to play for each candidate. [default: 1000]
+    --passes <n>         Most passes over the table. [default: 5]
+    --workers <n>        Worker processes to evaluate candidates.
+                         [default: 1]
+    -z <z>               Keep a change only if its gain is at least this
+                         many standard errors. [default: 3]
+    -o <file>            Write the improved strategy here.
+                         [default: optimized.txt]
+
+A candidate is the strategy with one key added or removed: hit, double
+or split (and surrender, if the rules allow it) for one hand total and
+dealer up-card. In each pass, the current strategy plays a set of
+pre-shuffled shoes heads-up. Then each candidate plays every one of
+those rounds again, starting from the same card. Most rounds never
+reach the cell that was changed and come out the same, so the gain is
+measured round by round, with far less noise than separate runs have.
+
+The changes that gain significantly are kept, best first, but only one
+per table cell in a pass, since changes to the same cell interact. Each
+pass uses fresh shoes, so a change kept by luck can be undone by a later
+pass. It stops when a pass finds nothing to change.
+"""
+
+import multiprocessing
+from typing import Any, Dict, List, Set, Tuple
+
+import docopt  # type:ignore
+
+import config
+import constants as c
+import Game
+import parse
+import running
+from Shoe import Shoe, SEED, derive_seed
+
+Key = Tuple[str, int, int]
+
+UPCARDS = range(2, 12)
+# The hand totals each key code can be changed for.
+CELLS = [(c.HIT_HARD, range(4, 21)),
+         (c.HIT_SOFT, range(12, 21)),
+         (c.DBL_HARD, range(4, 21)),
+         (c.DBL_SOFT, range(12, 21)),
+         (c.SPLIT, range(2, 12)),
+         (c.SURRENDER, range(4, 21))]
+
+# Set in each worker by set_shoes(). The shoes, each round's start as
+# (shoe, position), and the current strategy's net win for each round.
+rules: Dict[str, int] = {}
+shoes: List[bytes] = []
+starts: List[Tuple[int, int]] = []
+base_nets: List[int] = []
+
+
+def set_shoes(the_rules: Dict[str, int], the_shoes: List[bytes],
+              the_starts: List[Tuple[int, int]],
+              the_nets: List[int]) -> None:
+    "Set the rules, shoes and rounds that evaluate() plays."
+    global rules, shoes, starts, base_nets
+    rules = the_rules
+    shoes = the_shoes
+    starts = the_starts
+    base_nets = the_nets
+
+
+def make_shoes(decks: int, count: int, seed: str) -> List[bytes]:
+    "Return 'count' shuffled shoes, the same ones for the same seed."
+    shoe = Shoe(decks, seed=seed)
+    result = []
+    for i in range(count):
+        shoe.shuffle()
+        result.append(shoe.shoe)
+    return result
+
+
+def play_shoes(keys: Set[Key]) -> Tuple[List[Tuple[int, int]], List[int]]:
+    """Play each shoe down to the shuffle point with strategy 'keys'.
+
+    Return where each round started, and its net win.
+    """
+    game = Game.Game(strategy=keys, players=1, rules=rules)
+    st = game.st
+    round_starts = []
+    nets = []
+    for n, shoe in enumerate(shoes):
+        game.shoe.use(shoe)
+        while game.shoe.remaining() >= game.shuffle_point:
+            round_starts.append((n, len(shoe) - game.shoe.remaining()))
+            net = st.total_won - st.total_lost
+            game.play_round()
+            nets.append(st.total_won - st.total_lost - net)
+    return round_starts, nets
+
+
+def evaluate(keys: Set[Key]) -> Tuple[int, int]:
+    """Play every round again from its start, with strategy 'keys'.
+
+    Return the sum of the differences from the current strategy's net
+    wins, and the sum of their squares.
+    """
+    game = Game.Game(strategy=keys, players=1, rules=rules)
+    st = game.st
+    diff_sum = diff_sum_sq = 0
+    for (n, pos), base in zip(starts, base_nets):
+        game.shoe.use(shoes[n][pos:])
+        net = st.total_won - st.total_lost
+        game.play_round()
+        d = st.total_won - st.total_lost - net - base
+        diff_sum += d
+        diff_sum_sq += d * d
+    return diff_sum, diff_sum_sq
+
+
+def candidates() -> List[Key]:
+    "Return the keys that can be toggled: every cell the rules allow."
+    result = []
+    for code, totals in CELLS:
+        if code == c.SURRENDER and not rules['surrender']:
+            continue
+        for total in totals:
+            for up in UPCARDS:
+                result.append((code, total, up))
+    return result
+
+
+def cell(key: Key) -> Tuple[str, int, int]:
+    "Return the table cell that 'key' belongs to."
+    code, total, up = key
+    if code in (c.HIT_SOFT, c.DBL_SOFT):
+        return ('soft', total, up)
+    elif code == c.SPLIT:
+        return ('pair', total, up)
+    return ('hard', total, up)
+
+
+def describe(keys: Set[Key], key: Key) -> str:
+    "Say what toggling 'key' does to 'keys'."
+    sign = '-' if key in keys else '+'
+    return f"{sign} {parse.WORDS[key[0]]} {key[1]} vs {key[2]}"
+
+
+def one_pass(pool: Any, keys: Set[Key], z: float) -> Set[Key]:
+    """Try every candidate against 'keys', and return the improved keys.
+
+    'pool' is a process pool, or None to play everything here.
+    """
+    cands = candidates()
+    tries = [keys ^ {k} for k in cands]
+    if pool is None:
+        results = list(map(evaluate, tries))
+    else:
+        results = pool.map(evaluate, tries, chunksize=8)
+
+    gains = []
+    for key, (diff_sum, diff_sum_sq) in zip(cands, results):
+        # Heads-up, so every round is one hand.
+        gain, se = running.ev_stderr(len(starts), len(starts), diff_sum,
+                                     diff_sum_sq, Game.BET)
+        if gain > z * se:
+            gains.append((gain, se, key))
+    gains.sort(reverse=True)
+
+    changed = set()
+    for gain, se, key in gains:
+        if cell(key) in changed:
+            continue
+        changed.add(cell(key))
+        print(f"  {describe(keys, key):28} "
+              f"{running.interval(gain, se)}")
+        keys = keys ^ {key}
+    return keys
+
+
+def main() -> None:
+    args = docopt.docopt(__doc__)
+    the_rules = config.load_config(args['HOUSE-RULES'])
+    keys = parse.parse_strategy(args['STRATEGY'])
+    num_shoes = int(args['-n'])
+    workers = int(args['--workers'])
+    z = float(args['-z'])
+    set_shoes(the_rules, [], [], [])
+
+    for n in range(int(args['--passes'])):
+        the_shoes = make_shoes(the_rules['num_decks'], num_shoes,
+                               derive_seed(SEED, 'optimize pass', n))
+        set_shoes(the_rules, the_shoes, [], [])
+        the_starts, the_nets = play_shoes(keys)
+        set_shoes(the_rules, the_shoes, the_starts, the_nets)
+        ev, se = running.ev_stderr(len(starts), len(starts), sum(base_nets),
+                                   sum(d * d for d in base_nets), Game.BET)
+        print(f"pass {n + 1}: {len(starts)} rounds, "
+              f"%ev/hand {running.interval(ev, se)}")
+        if workers > 1:
+            with multiprocessing.Pool(workers, initializer=set_shoes,
+                                      initargs=(the_rules, the_shoes,
+                                                the_starts, the_nets)) \
+                    as pool:
+                new_keys = one_pass(pool, keys, z)
+        else:
+            new_keys = one_pass(None, keys, z)
+        if new_keys == keys:
+            print("  no changes")
+            break
+        keys = new_keys
+
+    parse.write_strategy(keys, args['-o'],
+                         f"Optimized from {args['STRATEGY']}\n"
+                         f"with {args['HOUSE-RULES']}")
+    print(f"wrote {args['-o']}")
+
+
+if __name__ == '__main__':
+    main()
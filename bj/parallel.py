@@ -0,0 +1,93 @@
+"""
+parallel.py: Play a simulation as shards, one per worker process.
+
+Each shard is a complete Game with its own Shoe, seeded independently.
+When the shards are done, their Statistics are merged into one result.
+
+With a master seed, shard n of batch b is seeded with
+Shoe.derive_seed(seed, 'batch', b, 'shard', n), so a run with the same
+seed, worker count and batch size deals the same cards every time.
+"""
+
+import multiprocessing.pool
+from typing import Set, Tuple, List, Dict, Optional
+
+import count
+import Game
+import report
+from Shoe import derive_seed
+
+# (rules, strategy, players, rounds, seed, count, report, infinite,
+#  profile)
+Job = Tuple[Dict[str, int], Set[Tuple[str, int, int]], int, int,
+            Optional[str], Optional[count.CountPlay], bool, bool, bool]
+
+
+def split_rounds(rounds: int, shards: int) -> List[int]:
+    "Divide 'rounds' into 'shards' nearly equal parts."
+    base, extra = divmod(rounds, shards)
+    return [base + 1 if n < extra else base for n in range(shards)]
+
+
+def shard_seed(seed: str, batch: int, shard: int) -> str:
+    "Return the seed for one shard of one batch, from the master seed."
+    return derive_seed(seed, 'batch', batch, 'shard', shard)
+
+
+def play_shard(job: Job) -> Tuple[Game.Statistics,
+                                  Optional[report.HandReport],
+                                  Optional[Game.Profile]]:
+    "Play one shard of the simulation, and return its statistics."
+    (rules, strategy, players, rounds, seed, count_play, want_report,
+     infinite, want_profile) = job
+    game = Game.Game(strategy=strategy,
+                     players=players,
+                     rules=rules,
+                     seed=seed,
+                     count=count_play,
+                     report=report.HandReport() if want_report else None,
+                     infinite=infinite,
+                     profile=Game.Profile() if want_profile else None)
+    game.play_rounds(rounds)
+    return game.st, game.report, game.profile
+
+
+def play_parallel(pool: multiprocessing.pool.Pool,
+                  rules: Dict[str, int],
+                  strategy: Set[Tuple[str, int, int]],
+                  players: int,
+                  rounds: int,
+                  workers: int,
+                  seed: Optional[str] = None,
+                  batch=0,
+                  count_play: Optional[count.CountPlay] = None,
+                  hand_report: Optional[report.HandReport] = None,
+                  infinite=False,
+                  profile: Optional[Game.Profile] = None
+                  ) -> Game.Statistics:
+    """Play 'rounds' rounds split across 'workers' processes in 'pool'.
+
+    If 'seed' is given, every shard of every batch gets its own seed
+    derived from it. Otherwise every shard's shoe is seeded by the system.
+    If 'hand_report' is given, the shards' reports are added to it.
+    If 'infinite' is set, the shards deal from InfiniteShoes.
+    If 'profile' is given, the shards' profiles are added to it, so its
+    times are the sum over the workers, not the time that passed.
+    """
+    jobs: List[Job] = []
+    for n, r in enumerate(split_rounds(rounds, workers)):
+        s = shard_seed(seed, batch, n) if seed is not None else None
+        jobs.append((rules, strategy, players, r, s, count_play,
+                     hand_report is not None, infinite,
+                     profile is not None))
+
+    results = pool.map(play_shard, jobs, chunksize=1)
+
+    st = Game.Statistics()
+    for shard_st, shard_report, shard_profile in results:
+        st.merge(shard_st)
+        if hand_report is not None and shard_report is not None:
+            hand_report.merge(shard_report)
+        if profile is not None and shard_profile is not None:
+            profile.merge(shard_profile)
+    return st
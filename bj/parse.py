@@ -1,10 +1,23 @@
 
-from typing import Set, Tuple, List
+from typing import Dict, Optional, Set, Tuple, List
 
 import constants as c
 
 strategy: Set[Tuple[str, int, int]] = set()
 
+# A deviation is (op, count, keys): the keys apply only when the true
+# count compares with 'count' as 'op' says, e.g. ('<', 0, {...}).
+Deviation = Tuple[str, int, Set[Tuple[str, int, int]]]
+DEVIATION_OPS = ('<', '<=', '>', '>=', '==')
+
+# How each key code is written in a strategy file, in file order.
+WORDS = {c.HIT_HARD: 'hit hard',
+         c.HIT_SOFT: 'hit soft',
+         c.DBL_HARD: 'double hard',
+         c.DBL_SOFT: 'double soft',
+         c.SPLIT: 'split',
+         c.SURRENDER: 'surrender'}
+
 
 def do_hit(s: str, f: List[str]) -> None:
     counts = f[2].split(',')
@@ -50,7 +63,20 @@ def do_surrender(f: List[str]) -> None:
             strategy.add(key)
 
 
-def parse_strategy(fname: str) -> Set[Tuple[str, int, int]]:
+def parse_strategy(fname: str, deviations: Optional[List[Deviation]] = None
+                   ) -> Set[Tuple[str, int, int]]:
+    """Return the set of strategy keys in file 'fname'.
+
+    A line ending in a true count condition, like 'tc < 0', is a
+    deviation. It is added to 'deviations' if that is given, and is
+    otherwise ignored.
+
+    A deviation can only add an action to the base strategy, not take
+    one away. To stand on hard 16 vs 10 at tc >= 0, leave 'hit hard 16
+    vs 10' out of the base lines, and add 'hit hard 16 vs 10 tc < 0'.
+    """
+    global strategy
+    strategy = set()
     with open(fname, 'rt') as fd:
         for line in fd:
             line = line.rstrip()
@@ -61,6 +87,16 @@ def parse_strategy(fname: str) -> Set[Tuple[str, int, int]]:
                 continue
             f = line.split()
 
+            cond = None
+            if len(f) > 3 and f[-3] == 'tc':
+                if f[-2] not in DEVIATION_OPS:
+                    print('error:', line)
+                    continue
+                cond = (f[-2], int(f[-1]))
+                f = f[:-3]
+                base = strategy
+                strategy = set()
+
             if f[0] == 'hit':
                 if f[1] == 'hard':
                     do_hit(c.HIT_HARD, f)
@@ -81,9 +117,40 @@ def parse_strategy(fname: str) -> Set[Tuple[str, int, int]]:
                 do_surrender(f)
             else:
                 print('error:', line)
+
+            if cond:
+                if deviations is not None:
+                    deviations.append((cond[0], cond[1], strategy))
+                strategy = base
     return strategy
 
 
+def join(nums) -> str:
+    return ','.join(str(n) for n in nums)
+
+
+def write_strategy(keys: Set[Tuple[str, int, int]], fname: str,
+                   comment='') -> None:
+    "Write a strategy set to 'fname', in the format parse_strategy reads."
+    with open(fname, 'wt') as fd:
+        for line in comment.splitlines():
+            print(f'# {line}', file=fd)
+        for code, words in WORDS.items():
+            upcards: Dict[int, List[int]] = {}
+            for (action, total, up) in keys:
+                if action == code:
+                    upcards.setdefault(total, []).append(up)
+            # Totals with the same up-cards share a line.
+            lines: Dict[Tuple[int, ...], List[int]] = {}
+            for total in sorted(upcards):
+                ups = tuple(sorted(upcards[total]))
+                lines.setdefault(ups, []).append(total)
+            if lines:
+                print(file=fd)
+            for ups, totals in lines.items():
+                print(f'{words} {join(totals)} vs {join(ups)}', file=fd)
+
+
 if __name__ == '__main__':
 
     s = parse_strategy('data/never-bust.txt')
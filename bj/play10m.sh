@@ -1,8 +1,8 @@
 #!/bin/bash
 
+# 10 million hands (2 million rounds of 5 seats), split across worker
+# processes. Set WORKERS to the number of cores you want to use.
+
 rm stats.txt
-for x in {1..10} ; do
-  ./bj.py        -n 200000 -s 5    data/house.cfg $1
-  echo $x million
-done
+./bj.py        -n 2000000 -s 5 --workers ${WORKERS:-4} data/house.cfg $1
 ./summary_stats.py
@@ -0,0 +1,157 @@
+"""
+report.py: EV by starting hand, dealer up-card and first action.
+
+Each seat's hand in each round is counted in one cell of HandReport: its
+first two cards (a hard total, a soft total, or a pair), the dealer
+up-card, and the first thing the player did with it. The net win for
+the seat in that round, splits and all, goes into the same cell. The
+counters are flat arrays, so adding a hand is an index calculation and
+two increments.
+
+write() prints tables with a row per starting hand and a column per
+up-card: the EV per hand, how often the cell comes up, and how much it
+adds to the EV overall, which shows the cells that cost the most. Then
+the action taken in each cell, and the EV for each action.
+"""
+
+from array import array
+from typing import List, Sequence
+
+from Hand import Hand
+
+UPCARDS = range(2, 12)
+# Up-cards index the arrays directly.
+NUM_UPCARDS = 12
+
+ROWS = [f'hard {t}' for t in range(5, 20)] + \
+    [f'soft {t}' for t in range(13, 22)] + \
+    [f'pair {c}' for c in range(2, 12)]
+
+# The first action taken on a hand. NONE is for blackjacks, and for
+# hands that lost to a dealer blackjack before anything was done.
+STAND, HIT, DOUBLE, SPLIT, SURRENDER, NONE = range(6)
+ACTIONS = ('stand', 'hit', 'double', 'split', 'surrender', 'none')
+LETTERS = 'SHDPR-'
+
+
+def make_row_of() -> List[List[int]]:
+    "Return the ROWS index for each pair of first cards, 1 to 11."
+    row_of = [[0] * 12 for c in range(12)]
+    for c1 in range(1, 12):
+        for c2 in range(1, 12):
+            # A 1 is an ace that has been counted as 1.
+            a, b = (11 if c1 == 1 else c1), (11 if c2 == 1 else c2)
+            if a == b:
+                name = f'pair {a}'
+            elif a == 11 or b == 11:
+                name = f'soft {a + b}'
+            else:
+                name = f'hard {a + b}'
+            row_of[c1][c2] = ROWS.index(name)
+    return row_of
+
+
+ROW_OF = make_row_of()
+
+
+def first_action(h: Hand, dealer_bj: bool) -> int:
+    "Return what was done first with hand 'h'."
+    if h.blackjack or dealer_bj:
+        return NONE
+    if h.surrendered:
+        return SURRENDER
+    if h.obsolete:
+        return SPLIT
+    if h.doubled:
+        return DOUBLE
+    if len(h.cards) > 2:
+        return HIT
+    return STAND
+
+
+class HandReport:
+    "Counts and net wins, by starting hand, up-card and first action."
+    def __init__(self) -> None:
+        size = len(ROWS) * NUM_UPCARDS * len(ACTIONS)
+        self.count = array('q', bytes(8 * size))
+        self.net = array('q', bytes(8 * size))
+
+    def add(self, hands: Sequence[Hand], up: int, dealer_bj: bool,
+            net: int) -> None:
+        "Add one seat's round: its hands, and its net win for them all."
+        h = hands[0]
+        cards = h.cards
+        n = ((ROW_OF[cards[0]][cards[1]] * NUM_UPCARDS + up) * len(ACTIONS)
+             + first_action(h, dealer_bj))
+        self.count[n] += 1
+        self.net[n] += net
+
+    def merge(self, other: 'HandReport') -> None:
+        "Add the counts from another report (e.g. a worker shard) into ours."
+        for n in range(len(self.count)):
+            self.count[n] += other.count[n]
+            self.net[n] += other.net[n]
+
+    def cell(self, row: int, up: int) -> List[int]:
+        "Return the flat array indexes of a cell, one for each action."
+        start = (row * NUM_UPCARDS + up) * len(ACTIONS)
+        return list(range(start, start + len(ACTIONS)))
+
+    def write(self, fname: str, strategy_name: str, bet: int) -> None:
+        "Write the report tables to 'fname'."
+        total = sum(self.count)
+        with open(fname, 'wt') as f:
+            print(f"strategy {strategy_name}", file=f)
+            print(f"hands {total}", file=f)
+            self.write_table(f, "EV per hand, % of the bet",
+                             lambda c, w: f"{100 * w / (c * bet):6.1f}"
+                             if c else '')
+            self.write_table(f, "Frequency, % of hands",
+                             lambda c, w: f"{100 * c / total:6.3f}"
+                             if c else '')
+            self.write_table(f, "Part of the overall EV per hand, "
+                             "% of the bet",
+                             lambda c, w: f"{100 * w / (total * bet):6.3f}"
+                             if c else '')
+            self.write_actions(f, bet)
+
+    def write_table(self, f, title: str, fmt) -> None:
+        "Write a table of fmt(count, net) for each starting hand & up-card."
+        print(file=f)
+        print(title, file=f)
+        print(f"{'':8}" + ''.join(f"{'A' if u == 11 else u:>7}"
+                                  for u in UPCARDS), file=f)
+        for row, name in enumerate(ROWS):
+            line = f"{name:8}"
+            for up in UPCARDS:
+                cell = self.cell(row, up)
+                c = sum(self.count[n] for n in cell)
+                w = sum(self.net[n] for n in cell)
+                line += f"{fmt(c, w):>7}"
+            print(line, file=f)
+
+    def write_actions(self, f, bet: int) -> None:
+        "Write the action taken in each cell, and the EV of each action."
+        print(file=f)
+        print("First action: S stand, H hit, D double, P split, "
+              "R surrender, - none, * more than one", file=f)
+        print(f"{'':8}" + ''.join(f"{'A' if u == 11 else u:>3}"
+                                  for u in UPCARDS), file=f)
+        for row, name in enumerate(ROWS):
+            line = f"{name:8}"
+            for up in UPCARDS:
+                taken = [a for a, n in enumerate(self.cell(row, up))
+                         if self.count[n] and a != NONE]
+                letter = LETTERS[taken[0]] if len(taken) == 1 else \
+                    '*' if taken else ''
+                line += f"{letter:>3}"
+            print(line, file=f)
+
+        print(file=f)
+        print(f"{'action':10} {'hands':>12} {'%ev/hand':>9}", file=f)
+        for a, name in enumerate(ACTIONS):
+            c = sum(self.count[a::len(ACTIONS)])
+            w = sum(self.net[a::len(ACTIONS)])
+            if c:
+                print(f"{name:10} {c:12} {100 * w / (c * bet):9.3f}",
+                      file=f)
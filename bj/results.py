@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+
+"""
+results.py: A SQLite store of simulation runs, and summaries of them.
+
+Usage:
+    results.py [--db <file>] [--strategy <name>] [--rules <hash>]
+
+Options:
+    -h  --help           Show this screen, and exit.
+    --db <file>          The results store. [default: runs.db]
+    --strategy <name>    Only runs of strategy files with this name.
+    --rules <hash>       Only runs with these house rules.
+
+Each run of bj.py adds a row: when, the strategy file and a hash of its
+contents, the house rules and their hash, the seed, how it was played,
+and every Statistics counter. The counters all add up across runs, so a
+summary is one indexed GROUP BY, however many runs there are.
+
+This prints one line for each strategy, rule set, penetration, mode and
+number of players:
+the number of runs and rounds, %win, and the EV per hand with its
+standard error. Runs that bet by a ramp, play from an infinite shoe or
+run vectorized have their own modes, so they are not pooled with
+flat-bet runs of the same strategy.
+
+The store is not results.db, which testbj.py uses for its checked deals.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import docopt  # type:ignore
+
+import Game
+import parse
+import running
+
+RUNS_DB = 'runs.db'
+# Commit after this many runs are added.
+COMMIT_INTERVAL = 50
+
+# Statistics counters, in column order
+COUNTERS = Game.Statistics.__slots__
+
+SCHEMA = f"""
+create table if not exists runs (
+    id integer primary key,
+    time text,
+    strategy text,
+    strategy_hash text,
+    rules text,
+    rules_hash text,
+    seed text,
+    mode text,
+    players integer,
+    penetration real,
+    {', '.join(f'{name} integer' for name in COUNTERS)}
+);
+create index if not exists runs_strategy on runs (strategy_hash);
+create index if not exists runs_rules on runs (rules_hash, strategy_hash);
+"""
+
+
+def strategy_hash(keys: Set[Tuple[str, int, int]],
+                  deviations: Sequence[parse.Deviation] = ()) -> str:
+    "Return a short hash of a strategy set, whatever file it came from."
+    text = repr(sorted(keys))
+    for op, n, dev_keys in deviations:
+        text += f" tc {op} {n}: {sorted(dev_keys)}"
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def rules_hash(rules: Dict[str, int]) -> str:
+    "Return a short hash of a set of house rules."
+    text = json.dumps(rules, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+class RunStore:
+    "The runs table. Adds are committed in batches, and on close()."
+    def __init__(self, fname=RUNS_DB) -> None:
+        self.db = sqlite3.connect(fname)
+        self.db.executescript(SCHEMA)
+        have = {row[1] for row in self.db.execute('pragma table_info(runs)')}
+        if 'penetration' not in have:
+            self.db.execute("alter table runs add column penetration real "
+                            "default 0.25")
+        for name in COUNTERS:
+            if name not in have:
+                # Statistics has a new counter since this store was made.
+                self.db.execute(f"alter table runs add column {name} "
+                                "integer default 0")
+        self.pending = 0
+
+    def add(self,
+            st: Game.Statistics,
+            strategy_name: str,
+            keys: Set[Tuple[str, int, int]],
+            rules: Dict[str, int],
+            players: int,
+            seed: Optional[str] = None,
+            mode='serial',
+            deviations: Sequence[parse.Deviation] = (),
+            penetration=0.25) -> None:
+        "Add one run's results."
+        values: List[Any] = [time.strftime('%Y-%m-%d %H:%M:%S'),
+                             strategy_name, strategy_hash(keys, deviations),
+                             json.dumps(rules, sort_keys=True),
+                             rules_hash(rules), seed, mode, players,
+                             penetration]
+        values += [getattr(st, name) for name in COUNTERS]
+        names = ('time, strategy, strategy_hash, rules, rules_hash, seed, '
+                 'mode, players, penetration, ' + ', '.join(COUNTERS))
+        marks = ', '.join('?' * len(values))
+        self.db.execute(f"insert into runs ({names}) values ({marks})",
+                        values)
+        self.pending += 1
+        if self.pending >= COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self) -> None:
+        self.db.commit()
+        self.pending = 0
+
+    def close(self) -> None:
+        self.commit()
+        self.db.close()
+
+    def totals(self, keys: Set[Tuple[str, int, int]],
+               rules: Dict[str, int], penetration: float,
+               mode: str, players: int) -> Game.Statistics:
+        "Return the stored totals for a strategy, rule set, mode and seats."
+        sums = ', '.join(f'sum({name})' for name in COUNTERS)
+        row = self.db.execute(
+            f"select {sums} from runs where strategy_hash = ? "
+            "and rules_hash = ? and penetration = ? and mode = ? "
+            "and players = ?",
+            (strategy_hash(keys), rules_hash(rules), penetration,
+             mode, players)).fetchone()
+        st = Game.Statistics()
+        for name, value in zip(COUNTERS, row):
+            setattr(st, name, value or 0)
+        return st
+
+    def summary(self, strategy: Optional[str] = None,
+                rules: Optional[str] = None) -> List[Tuple[Any, ...]]:
+        """Return the totals by strategy, rules, penetration, mode and
+        players.
+
+        Each row is (strategy, strategy_hash, rules_hash, penetration,
+        mode, players, runs, followed by the sum of each counter in
+        COUNTERS).
+        """
+        where = []
+        args = []
+        if strategy:
+            where.append('strategy = ?')
+            args.append(strategy)
+        if rules:
+            where.append('rules_hash = ?')
+            args.append(rules)
+        sums = ', '.join(f'sum({name})' for name in COUNTERS)
+        query = f"select min(strategy), strategy_hash, rules_hash, " \
+            f"penetration, mode, players, count(*), {sums} from runs"
+        if where:
+            query += ' where ' + ' and '.join(where)
+        query += ' group by rules_hash, strategy_hash, penetration, mode, ' \
+            'players order by rules_hash, mode, players'
+        return self.db.execute(query, args).fetchall()
+
+    def stats(self, row: Tuple[Any, ...]) -> Game.Statistics:
+        "Return a Statistics holding the totals in a summary() row."
+        st = Game.Statistics()
+        for name, value in zip(COUNTERS, row[7:]):
+            setattr(st, name, value)
+        return st
+
+
+def main() -> None:
+    args = docopt.docopt(__doc__)
+    store = RunStore(args['--db'])
+    print(f"{'strategy':32} {'rules':16} {'pen':>4} {'mode':20} "
+          f"{'seats':>5} {'runs':>5} {'rounds':>10} {'%win':>7}  %ev/hand")
+    for row in store.summary(args['--strategy'], args['--rules']):
+        st = store.stats(row)
+        gain = 100 * (st.total_won - st.total_lost) / st.total_bet
+        print(f"{row[0]:32} {row[2]:16} {row[3]:4} {row[4]:20} {row[5]:5} "
+              f"{row[6]:5} {st.rounds_played:10} {gain:7.4f}  "
+              f"{running.interval(*st.ev())}")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+running.py: Running estimates of EV, with standard errors, during a run.
+
+Each round's net win, in chips and summed over all the seats, is one
+sample. Statistics keeps the sum of the samples (total_won - total_lost)
+and the sum of their squares (net_sum_sq). Those are enough for the mean
+and its standard error, and they add up across shards and runs.
+"""
+
+import math
+import time
+from typing import Any, Tuple
+
+# z for a 95% confidence interval
+Z95 = 1.96
+
+
+def ev_stderr(rounds: int, hands: int, net: int, net_sum_sq: int,
+              bet: int) -> Tuple[float, float]:
+    """Return the EV per hand and its standard error.
+
+    Both are in percent of 'bet', the initial bet on each hand.
+    """
+    if rounds == 0:
+        return 0.0, 0.0
+    mean = net / rounds
+    if rounds > 1:
+        var = max(net_sum_sq / rounds - mean * mean, 0.0) \
+            * rounds / (rounds - 1)
+    else:
+        var = 0.0
+    scale = 100 * rounds / (bet * hands)
+    return mean * scale, math.sqrt(var / rounds) * scale
+
+
+def interval(ev: float, se: float) -> str:
+    "Format an EV, its standard error and 95% confidence interval."
+    return f"{ev:5.4} +/- {se:.3} (95% CI {ev - Z95 * se:5.4} " \
+        f"to {ev + Z95 * se:5.4})"
+
+
+class StatsStream:
+    """Write a line to 'fname' after each batch of rounds.
+
+    A line has the batch's own partial sums (rounds, hands, net win and
+    sum of squared round nets), followed by the running EV per hand, its
+    standard error, and the 95% confidence interval, in percent.
+
+    If 'target' is not zero, add() says when the standard error has come
+    down to 'target', so the run can stop.
+    """
+    def __init__(self, fname: str, strategy_name: str, bet: int,
+                 target=0.0) -> None:
+        self.f = open(fname, 'at')
+        self.bet = bet
+        self.target = target
+        self.last = (0, 0, 0, 0)
+        print(f"# {time.asctime()} {strategy_name}", file=self.f)
+        print("# rounds hands net net_sum_sq ev se ci_low ci_high",
+              file=self.f)
+
+    def add(self, st: Any) -> bool:
+        """Record the batch played since the last call, from Statistics.
+
+        Return True if the target precision has been reached.
+        """
+        now = (st.rounds_played, st.hands_played,
+               st.total_won - st.total_lost, st.net_sum_sq)
+        part = [a - b for a, b in zip(now, self.last)]
+        self.last = now
+        ev, se = ev_stderr(*now, self.bet)
+        print(*part, f"{ev:.4f} {se:.4f} {ev - Z95 * se:.4f} "
+              f"{ev + Z95 * se:.4f}", file=self.f)
+        self.f.flush()
+        return self.target > 0 and now[0] > 1 and se <= self.target
+
+    def close(self) -> None:
+        self.f.close()
@@ -9,20 +9,34 @@ the same as the first one found.
 import sys
 from typing import Dict
 
+from Game import BET
+import running
+
 STATS = 'stats.txt'
 
 
-def print_stats(d: Dict[str, int], strategy: str):
+def print_stats(d: Dict[str, int], strategy: str, seen: Dict[str, int]):
+    """Print the summed stats 'd'.
+
+    'seen' is how many blocks each stat was in. The EV's standard error
+    needs net_sum_sq from every block, and older blocks don't have it.
+    """
     print("strategy", strategy)
     for k in d:
         print(k, d[k])
     gain = 100 * (d['total_won'] - d['total_lost']) / d['total_bet']
     print(f"%win: {gain:5.4}")
+    if seen.get('net_sum_sq') == seen['rounds_played']:
+        ev, se = running.ev_stderr(d['rounds_played'], d['hands_played'],
+                                   d['total_won'] - d['total_lost'],
+                                   d['net_sum_sq'], BET)
+        print(f"%ev/hand: {running.interval(ev, se)}")
 
 
 def main() -> None:
     strategy = ''
     d: Dict[str, int] = {}
+    seen: Dict[str, int] = {}
     with open(STATS, 'rt') as fstats:
         for line in fstats:
             f = line.split()
@@ -36,8 +50,10 @@ def main() -> None:
             elif not f[0].startswith('%'):
                 if f[0] not in d:
                     d[f[0]] = 0
+                    seen[f[0]] = 0
                 d[f[0]] += int(f[1])
-    print_stats(d, strategy)
+                seen[f[0]] += 1
+    print_stats(d, strategy, seen)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+"""
+sweep.py: Play a strategy under every combination of a set of rules.
+
+Usage:
+    sweep.py [-n <rounds>] [-s <seats>] [--workers <n>] [--test] \
+[--db <file>] [--decks <list>] [--hit-s17 <list>] [--das <list>] \
+[--split-hands <list>] [--surrender <list>] [--penetration <list>] \
+HOUSE-RULES STRATEGY
+
+Options:
+    -h  --help            Show this screen, and exit.
+    -n <rounds>           Rounds to play for each rule set.
+                          [default: 100000]
+    -s <seats>            Number of players to play. [default: 1]
+    --workers <n>         Rule sets to play at once. [default: 1]
+    --test                Use the same repeatable cards for every rule set.
+    --db <file>           The results store. [default: runs.db]
+    --decks <list>        Values of num_decks, e.g. 1,2,6,8
+    --hit-s17 <list>      Values of hit_s17
+    --das <list>          Values of das_allowed
+    --split-hands <list>  Values of max_split_hands
+    --surrender <list>    Values of surrender
+    --penetration <list>  Fractions of the shoe left at the shuffle.
+                          [default: 0.25]
+
+The grid is every combination of the listed values. Any rule not listed
+keeps its value from HOUSE-RULES. Each rule set is a job for the process
+pool, and its results go into the results store as soon as it finishes.
+A rule set that already has rounds in the store, at the same number of
+seats, only plays the rounds it is short of. So an interrupted sweep
+picks up where it left off when run again, and a finished one does
+nothing. With --test, the cards for a top-up come from a seed derived
+from the rounds already done, so no deal is played twice.
+
+When a rule set has no surrender, the strategy's surrender keys are
+dropped for it, since Player doesn't check the rule itself.
+
+At the end, a table of %win and EV per hand for each rule set is
+printed, from the store.
+"""
+
+import itertools
+import multiprocessing
+from typing import Dict, List, Optional, Set, Tuple
+
+import docopt  # type:ignore
+
+import config
+import constants as c
+import Game
+import parse
+import results
+import running
+from Shoe import SEED, derive_seed
+
+# The rules that can be swept, by option
+SWEEPS = [('--decks', 'num_decks'),
+          ('--hit-s17', 'hit_s17'),
+          ('--das', 'das_allowed'),
+          ('--split-hands', 'max_split_hands'),
+          ('--surrender', 'surrender')]
+
+# Rows in the store made by sweeps have this mode.
+MODE = 'sweep'
+
+# (rules, penetration)
+Cell = Tuple[Dict[str, int], float]
+# (cell, strategy, players, rounds, seed)
+Job = Tuple[Cell, Set[Tuple[str, int, int]], int, int, Optional[str]]
+
+
+def make_grid(base: Dict[str, int], args: Dict) -> List[Cell]:
+    "Return every combination of the rule values in 'args'."
+    names = []
+    values = []
+    for option, name in SWEEPS:
+        names.append(name)
+        if args[option]:
+            values.append([int(v) for v in args[option].split(',')])
+        else:
+            values.append([base[name]])
+    pens = [float(p) for p in args['--penetration'].split(',')]
+    grid = []
+    for combo in itertools.product(*values):
+        rules = dict(base)
+        rules.update(zip(names, combo))
+        for pen in pens:
+            grid.append((rules, pen))
+    return grid
+
+
+def play_cell(job: Job) -> Tuple[Cell, Game.Statistics, Optional[str]]:
+    "Play one rule set, and return its statistics and seed."
+    cell, strategy, players, rounds, seed = job
+    rules, pen = cell
+    if not rules['surrender']:
+        strategy = {k for k in strategy if k[0] != c.SURRENDER}
+    game = Game.Game(strategy=strategy,
+                     players=players,
+                     rules=rules,
+                     penetration=pen,
+                     seed=seed)
+    game.play_rounds(rounds)
+    return cell, game.st, seed
+
+
+def main() -> None:
+    args = docopt.docopt(__doc__)
+    base = config.load_config(args['HOUSE-RULES'])
+    name = args['STRATEGY']
+    strategy = parse.parse_strategy(name)
+    rounds = int(args['-n'])
+    players = int(args['-s'])
+    workers = int(args['--workers'])
+    test = args['--test']
+
+    store = results.RunStore(args['--db'])
+    grid = make_grid(base, args)
+    jobs: List[Job] = []
+    for rules, pen in grid:
+        done = store.totals(strategy, rules, pen, MODE,
+                            players).rounds_played
+        if done < rounds:
+            seed = derive_seed(SEED, 'sweep', done) if test else None
+            jobs.append(((rules, pen), strategy, players, rounds - done,
+                         seed))
+    print(f"{len(grid)} rule sets, {len(grid) - len(jobs)} already done")
+
+    def save(cell: Cell, st: Game.Statistics, seed: Optional[str]) -> None:
+        rules, pen = cell
+        store.add(st, name, strategy, rules, players, seed=seed,
+                  mode=MODE, penetration=pen)
+        # Commit each one, so nothing finished is lost if interrupted.
+        store.commit()
+        print(f"done: {rules} penetration {pen}")
+
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            for cell, st, seed in pool.imap_unordered(play_cell, jobs):
+                save(cell, st, seed)
+    else:
+        for job in jobs:
+            save(*play_cell(job))
+
+    print()
+    print(f"{'decks':>5} {'h17':>3} {'das':>3} {'splits':>6} {'surr':>4} "
+          f"{'pen':>5} {'%win':>7}  %ev/hand")
+    for rules, pen in grid:
+        st = store.totals(strategy, rules, pen, MODE, players)
+        gain = 100 * (st.total_won - st.total_lost) / st.total_bet
+        print(f"{rules['num_decks']:5} {rules['hit_s17']:3} "
+              f"{rules['das_allowed']:3} {rules['max_split_hands']:6} "
+              f"{rules['surrender']:4} {pen:5} {gain:7.4f}  "
+              f"{running.interval(*st.ev())}")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
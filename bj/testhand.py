@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""Check incremental hand values against a full recount.
+
+Usage: testhand.py
+
+This deals hands from the repeatable (--test) shoe, and plays them the
+way players and the dealer do: hitting, doubling, splitting, and dealer
+play under both settings of hit_s17. After every card, it compares the
+Hand with RefHand, which recounts the cards with sum() and count(11)
+the way Hand used to. Any difference stops the test with an error.
+"""
+
+from typing import List
+
+from Dealer import Dealer
+from Hand import Hand
+from Shoe import Shoe
+
+NUM_DECKS = 6
+NUM_HANDS = 200000
+
+
+class RefHand:
+    "The old Hand valuation: recount everything after every card."
+    def __init__(self, cards: List[int]) -> None:
+        self.cards = list(cards)
+        self.busted = False
+        self.update_value()
+        if self.big_aces == 2:
+            self.harden()
+
+    def harden(self) -> None:
+        first_ace = self.cards.index(11)
+        self.cards[first_ace] = 1
+        self.update_value()
+
+    def update_value(self) -> None:
+        self.value = sum(self.cards)
+        self.big_aces = self.cards.count(11)
+
+    def hit(self, c: int) -> None:
+        self.cards.append(c)
+        self.update_value()
+        if c == 11:
+            self.big_aces += 1
+        if self.value > 21:
+            if self.big_aces:
+                self.harden()
+            else:
+                self.busted = True
+
+
+def check(h: Hand, ref: RefHand, what: str) -> None:
+    "Stop with an error if the two hands differ."
+    if h.value != ref.value or h.is_soft() != (ref.big_aces > 0) \
+       or h.busted != ref.busted or h.cards != ref.cards:
+        raise AssertionError(f"{what}: {h} soft={h.is_soft()} "
+                             f"busted={h.busted}, expected {ref.cards}: "
+                             f"{ref.value} soft={ref.big_aces > 0} "
+                             f"busted={ref.busted}")
+
+
+def play_player(shoe: Shoe, n: int) -> None:
+    "Deal a player hand, and hit it until it reaches 21 or busts."
+    h = Hand(shoe)
+    shoe.start_round()
+    # Every 10th hand is a split hand, half of them aces.
+    split_card = 0 if n % 10 else (11 if n % 20 else 8)
+    h.reset(split_card=split_card)
+    dealt = shoe.end_round()
+    first = [split_card] if split_card else []
+    ref = RefHand(first + dealt)
+    check(h, ref, f"hand {n} deal")
+    while h.value < 21 and not h.busted:
+        shoe.start_round()
+        if n % 7 == 0:
+            h.double()
+        else:
+            h.hit()
+        ref.hit(shoe.end_round()[0])
+        check(h, ref, f"hand {n} hit")
+        if h.doubled:
+            break
+
+
+def play_dealer(shoe: Shoe, n: int) -> None:
+    "Play a dealer hand, and check it card by card."
+    d = Dealer(shoe, hit_s17=bool(n % 2))
+    shoe.start_round()
+    d.get_hand()
+    ref = RefHand(shoe.end_round())
+    check(d.hand, ref, f"dealer {n} deal")
+    shoe.start_round()
+    d.play_hand()
+    for c in shoe.end_round():
+        ref.hit(c)
+        if ref.value > 21 and ref.big_aces:
+            ref.harden()
+    check(d.hand, ref, f"dealer {n} play")
+
+
+def main() -> None:
+    shoe = Shoe(NUM_DECKS, repeatable=True)
+    shoe.enable_tracking(True)
+    shoe.shuffle()
+    for n in range(NUM_HANDS):
+        if shoe.remaining() < 52:
+            shoe.shuffle()
+        play_player(shoe, n)
+        play_dealer(shoe, n)
+    print(f"{NUM_HANDS} player and dealer hands: OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""Check that 21 on a split hand is paid 1:1, not as a blackjack.
+
+Usage: testsplit.py
+
+A pair of 10s is split against a dealer 17, and the first split hand
+draws an ace. Game and BatchGame play that round from a stacked shoe,
+and exact.py values the split when every card is an ace. In each, the
+10 + A must win the bet, not 3:2.
+"""
+
+import BatchGame
+import constants as c
+import exact
+import Game
+from Strategy import Strategy
+
+# Player 10 10, dealer 10 7, then the split hands draw A and 9.
+CARDS = [10, 10, 10, 7, 11, 9]
+UP = 10
+STRATEGY = {(c.SPLIT, 10, UP)}
+
+
+def check(what: str, got: float, expected: float) -> None:
+    "Stop with an error if 'got' isn't 'expected'."
+    if got != expected:
+        raise AssertionError(f"{what}: got {got}, expected {expected}")
+    print(f"{what}: OK")
+
+
+def test_game() -> None:
+    game = Game.Game(strategy=STRATEGY, penetration=0)
+    game.shoe.use(bytes(CARDS))
+    game.play_round()
+    st = game.st
+    check("Game blackjacks", st.blackjacks_won, 0)
+    # Both split hands win: 21 and 19 against 17.
+    check("Game net", st.total_won - st.total_lost, 2 * Game.BET)
+
+
+def test_batch() -> None:
+    game = BatchGame.BatchGame(lanes=1, strategy=STRATEGY, penetration=0)
+    game.shoes[0, :len(CARDS)] = CARDS
+    game.pos[0] = 0
+    game.play_round()
+    st = game.st
+    check("BatchGame blackjacks", st.blackjacks_won, 0)
+    check("BatchGame net", st.total_won - st.total_lost, 2 * Game.BET)
+
+
+def test_exact() -> None:
+    # Every card drawn is an ace, and the dealer always ends on 20.
+    probs = [0.0] * (len(exact.RANKS) - 1) + [1.0]
+    dealer = (0.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+    odds = exact.PlayerOdds(Strategy(STRATEGY), Game.default_rules, UP,
+                            probs, dealer)
+    ev, bet = odds.split(10, 1)
+    check("exact split EV", ev, 2.0)
+    check("exact split bet", bet, 2.0)
+
+
+def main() -> None:
+    test_game()
+    test_batch()
+    test_exact()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+"""
+verify_bin.py: Check a binary trace of player decisions against a strategy.
+
+Usage:
+    verify_bin.py [--trace <file>] STRATEGY
+
+Options:
+    -h  --help           Show this screen, and exit.
+    --trace <file>       The binary trace from bj.py -b.
+                         [default: trace.bin]
+
+The trace is memory-mapped as an array of (action, total, up-card,
+decision) records, as log.act() writes them. The decision each record
+should have is looked up in the compiled Strategy tables for all the
+records at once, and every record that doesn't match is an error.
+
+This is for a fixed strategy. A run with --count may play deviations,
+which show up here as errors.
+"""
+
+import os
+import sys
+
+import docopt  # type:ignore
+import numpy as np
+
+import constants as c
+import log
+import parse
+from Strategy import Strategy, HIT, DOUBLE
+
+RECORD = np.dtype([('action', np.uint8), ('total', np.uint8),
+                   ('up', np.uint8), ('decision', np.uint8)])
+assert RECORD.itemsize == log.RECORD_SIZE
+
+# Show at most this many errors.
+MAX_ERRORS = 20
+
+
+def expected(acts: np.ndarray, strategy: Strategy) -> np.ndarray:
+    "Return the decision the strategy makes for each record in 'acts'."
+    codes = np.array(strategy.codes, dtype=np.uint8)
+    splits = np.array(strategy.splits, dtype=np.uint8)
+    action = acts['action']
+    total = acts['total']
+    up = acts['up']
+    soft = np.isin(action, (log.ACTION_CODES[c.HIT_SOFT],
+                            log.ACTION_CODES[c.DBL_SOFT])).astype(np.uint8)
+    code = codes[up, soft, total]
+    result = np.zeros(len(acts), dtype=np.uint8)
+    for name, value in ((c.HIT_HARD, code & HIT),
+                        (c.HIT_SOFT, code & HIT),
+                        (c.DBL_HARD, code & DOUBLE),
+                        (c.DBL_SOFT, code & DOUBLE),
+                        (c.SPLIT, splits[up, total])):
+        mask = action == log.ACTION_CODES[name]
+        result[mask] = value[mask] > 0
+    return result
+
+
+def main() -> None:
+    args = docopt.docopt(__doc__)
+    strategy = Strategy(parse.parse_strategy(args['STRATEGY']))
+    # An empty file can't be mapped.
+    if os.path.getsize(args['--trace']) == 0:
+        print("no decisions")
+        return
+    acts = np.memmap(args['--trace'], dtype=RECORD, mode='r')
+    bad_action = acts['action'] >= len(log.ACTIONS)
+    if bad_action.any():
+        sys.exit(f"bad action code at record {np.argmax(bad_action)}")
+
+    errors = np.flatnonzero(expected(acts, strategy) != acts['decision'])
+    for n in errors[:MAX_ERRORS]:
+        a = acts[n]
+        print(f"ERROR record {n}: {log.ACTIONS[a['action']]} {a['total']} "
+              f"{a['up']} decision {a['decision']}")
+    print(f"{len(acts)} decisions, {len(errors)} errors")
+    if len(errors):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,53 @@
 
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 import glob
 import logging
 import os
 import time
-from typing import List
+from typing import Deque, Dict, List, Set, Tuple
+import sqlite3
 import sys
 
-from hash import hash_file
+from catalog import Catalog
 from repo import Repo
 import util
 
 
+# Files queued for the workers, per worker, before the walk waits.
+QUEUE_PER_WORKER = 4
+
+# (path, size, mtime, hash, read) of a file that has been stored.
+# 'read' is False if the hash came from the previous backup.
+Stored = Tuple[str, int, float, str, bool]
+
+
 class Backup:
-    """Class to perform a de-duped backup."""
+    """Class to perform a de-duped backup.
+
+    Files are hashed and compressed by a pool of worker threads, which
+    hashlib and zlib let run at the same time. The walk of the files to
+    back up queues them for the workers, and waits when too many are
+    queued. The lines of the backup file are written in the order the
+    files were queued, so the backup file is the same however many
+    workers there are.
+
+    An incremental backup loads the latest backup with the same prefix.
+    A file with the same size and mtime as it had then isn't read at all,
+    and gets the hash it had then.
+    """
 
-    def __init__(self, repos: str, prefix: str, verbose=False):
+    def __init__(self, repos: str, prefix: str, verbose=False, workers=1,
+                 incremental=False):
         """Open the backup detail file, and get ready to backup files."""
         self.verbose = verbose
         self.repos_name = repos
         self.repo = Repo(repos)
+        # path: (hash, mtime, size), from the previous backup
+        self.previous: Dict[str, Tuple[str, float, int]] = {}
+        if incremental:
+            self.load_previous(prefix)
         now = datetime.now()
         str_now = now.strftime('%Y%m%d_%H%M%S')
         self.bk_name = prefix + '_' + str_now
@@ -34,13 +62,38 @@ class Backup:
         self.files_total = 0
         self.files_stored = 0
         self.files_not_stored = 0
+        self.files_not_read = 0
         self.files_errors = 0
         self.bytes_read = 0
         self.start_time = time.time()
         self.elapsed_time: int
 
+        self.pool = ThreadPoolExecutor(workers)
+        self.queue: Deque[Future] = deque()
+        self.max_queued = QUEUE_PER_WORKER * workers
+        # Hashes already written to the backup file as 'new'
+        self.new_hashes: Set[str] = set()
+
+    def load_previous(self, prefix: str) -> None:
+        """Load the files in the latest backup with 'prefix', if any."""
+        last = self.repo.last_backup(prefix)
+        if last is None:
+            util.msg(f'No backup with prefix {prefix}. Reading every file.')
+            return
+        logging.info(f'incremental from: {last}')
+        for ent in self.repo.next_file(last):
+            if ent.size:
+                self.previous[ent.fname] = (ent.hash, float(ent.mtime),
+                                            int(ent.size))
+        util.msg(f'Incremental from {last}: {len(self.previous)} files.')
+
     def finish(self) -> None:
         """Write the backup detail file trailer and statistics."""
+        while self.queue:
+            self.write_entry()
+        self.pool.shutdown()
+        self.repo.save_index()
+        self.add_to_catalog()
         print('end', file=self.bkf)
         self.elapsed_time = int(time.time() - self.start_time)
         self.show_stats()
@@ -49,11 +102,31 @@ class Backup:
         if self.verbose:
             print('end backup')
 
+    def add_to_catalog(self) -> None:
+        """Add this backup's files to the catalog, before the trailer.
+
+        The files are read back from the backup file, as sync does. If
+        the catalog is busy, the next restore adds the backup instead.
+        """
+        self.bkf.flush()
+        rows = ((ent.fname, ent.hash, ent.mtime)
+                for ent in self.repo.next_file(self.bk_name))
+        try:
+            catalog = Catalog(self.repo)
+            try:
+                catalog.add_backup(self.bk_name, rows)
+            finally:
+                catalog.close()
+        except sqlite3.OperationalError as e:
+            util.warning(f'catalog not updated ({e}). '
+                         'The next restore will add this backup.')
+
     def show_stats(self) -> None:
         """Print final stats to stderr and the 'backup' file."""
         self.print_stat(f'total files = {self.files_total}')
         self.print_stat(f'files stored = {self.files_stored}')
         self.print_stat(f'files not stored = {self.files_not_stored}')
+        self.print_stat(f'files not read = {self.files_not_read}')
         self.print_stat(f'bytes read = {self.bytes_read}')
         self.print_stat(f'bytes written = {self.repo.bytes_written}')
         self.print_stat(f'errors = {self.files_errors}')
@@ -81,43 +154,72 @@ class Backup:
                 self.backup_file(os.path.join(root, f))
 
     def backup_file(self, path: str) -> None:
-        """Backup the file 'path' to the repository.
+        """Queue the file 'path' to be backed up to the repository.
 
-        Write the hashed contents to 'objects' if it isn't already there.
-        Write a line in the backup file to describe the backed up file.
+        Write the lines in the backup file for the files queued before it,
+        as they are finished, until there is room in the queue.
         """
         if self.verbose:
             print('backup', path)
-        self.files_total += 1
+        self.queue.append(self.pool.submit(self.store_file, path))
+        while len(self.queue) >= self.max_queued:
+            self.write_entry()
+
+    def store_file(self, path: str) -> Stored:
+        """Hash 'path', and write it to 'objects' if it isn't already there.
+
+        This runs in a worker thread.
+        """
         s = os.stat(path)
-        # self.bytes_read += os.stat(path).st_size
-        self.bytes_read += s.st_size
-        h = hash_file(path)
-        # mtime = os.path.getmtime(path) # XXX get this from os.stat ?
-        mtime = s.st_mtime
-        if self.repo.store_file(path, h):
-            print(f'new\t{h}\t{mtime}\t{path}', file=self.bkf)
+        prev = self.previous.get(path)
+        if prev is not None:
+            h, mtime, size = prev
+            if mtime == s.st_mtime and size == s.st_size and \
+               self.repo.find_file(os.path.join(*Repo.fname_from_hash(h))):
+                return (path, s.st_size, s.st_mtime, h, False)
+        h, _ = self.repo.store_file(path)
+        return (path, s.st_size, s.st_mtime, h, True)
+
+    def write_entry(self) -> None:
+        """Write a line in the backup file for the oldest queued file.
+
+        The first line with a hash stored by this backup is 'new', even if
+        a later file with the same contents was the one written.
+        """
+        path, size, mtime, h, read = self.queue.popleft().result()
+        self.files_total += 1
+        if read:
+            self.bytes_read += size
+        else:
+            self.files_not_read += 1
+        if h in self.repo.stored and h not in self.new_hashes:
+            self.new_hashes.add(h)
+            print(f'new\t{h}\t{mtime}\t{path}\t{size}', file=self.bkf)
             self.files_stored += 1
-            s = os.stat(path)
         else:
-            print(f'old\t{h}\t{mtime}\t{path}', file=self.bkf)
+            print(f'old\t{h}\t{mtime}\t{path}\t{size}', file=self.bkf)
             self.files_not_stored += 1
 
 
 def run_backup(repo_name: str, prefix: str, paths: List[str],
                verify=True,
-               verbose=False) -> None:
+               verbose=False,
+               workers=1,
+               incremental=False) -> None:
     """Perform a backup to the repository of all dirs/files in the list.
 
     Make sure we have an unlocked DDU repository. Process all items in
-    'paths'. If an item is '-', read path names from stdin.
+    'paths'. If an item is '-', read path names from stdin. 'workers'
+    files are hashed and compressed at once. If 'incremental' is set,
+    files unchanged since the last backup with 'prefix' are not read.
     """
     logging.info(f"backup list: {paths}")
     logging.info(f"backup repo: {repo_name}")
     print(f"Backing up to {repo_name} with prefix '{prefix}'.")
     repos = Repo(repo_name)
     if repos.lock():
-        bkup = Backup(repo_name, prefix, verbose=verbose)
+        bkup = Backup(repo_name, prefix, verbose=verbose, workers=workers,
+                      incremental=incremental)
         for g in paths:
             if g == '-':
                 for f in sys.stdin:
@@ -0,0 +1,141 @@
+"""An SQLite catalog of the files in every backup, for restore queries.
+
+A backup adds its files to the catalog when it finishes, in one short
+transaction, so a restore can sync the catalog while a backup runs.
+Backups the catalog doesn't have, because they were made before there
+was a catalog or it was busy, are added the next time it is synced.
+Each path is stored once, normalized as restore shows it, and each
+backup's files refer to it, so the catalog stays small with many
+backups of the same tree.
+
+A search pattern uses the index on paths for its literal prefix, up to
+the first wildcard. Each distinct path with that prefix is matched
+against the pattern itself, with fnmatch, and the files with a matching
+path are found with the index on files.path. The results are the same
+as matching every line of every backup file.
+"""
+
+import fnmatch
+import logging
+import re
+import sqlite3
+from typing import Iterable, Iterator, Optional, Tuple
+
+from repo import Repo
+import util
+
+CATALOG = '/catalog.db'
+
+SCHEMA = """
+create table if not exists backups (
+    id integer primary key,
+    name text unique
+);
+create table if not exists paths (
+    id integer primary key,
+    path text unique
+);
+create table if not exists files (
+    backup integer,
+    path integer,
+    hash text,
+    mtime real,
+    primary key (backup, path)
+) without rowid;
+create index if not exists files_path on files (path);
+"""
+
+# (backup name, normalized path, hash, mtime)
+Found = Tuple[str, str, str, float]
+# (file name, hash, mtime), as in a backup file
+Row = Tuple[str, str, str]
+
+
+class Catalog:
+    """The catalog of backed up files in a repository."""
+
+    def __init__(self, repo: Repo):
+        self.repo = repo
+        self.db = sqlite3.connect(repo.repo + CATALOG)
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Commit any changes, and close the catalog."""
+        self.db.commit()
+        self.db.close()
+
+    def sync(self) -> None:
+        """Add backups missing from the catalog, and drop deleted ones.
+
+        A backup file with no 'end' trailer is skipped. Its backup is
+        still running, or it failed.
+        """
+        have = {name: id for id, name in
+                self.db.execute('select id, name from backups')}
+        for name, id in have.items():
+            if name not in self.repo.all_backups:
+                logging.info(f'catalog: dropping {name}')
+                self.db.execute('delete from files where backup = ?', (id,))
+                self.db.execute('delete from backups where id = ?', (id,))
+        for name in self.repo.all_backups:
+            if name not in have and self.repo.backup_ended(name):
+                util.msg(f'Adding {name} to the catalog.')
+                self.add_backup(name, ((ent.fname, ent.hash, ent.mtime)
+                                       for ent in self.repo.next_file(name)))
+        self.db.commit()
+
+    def add_backup(self, name: str, rows: Iterable[Row]) -> None:
+        """Add backup 'name', with its files 'rows', in one transaction.
+
+        The rows are the 'old' and 'new' files of the backup. If the
+        catalog has 'name' already, because a backup and a sync both added
+        it, nothing is added. A busy catalog raises
+        sqlite3.OperationalError, and adds nothing.
+        """
+        with self.db:
+            cur = self.db.execute('insert or ignore into backups (name) '
+                                  'values (?)', (name,))
+            if cur.rowcount == 0:
+                logging.info(f'catalog: {name} is there already')
+                return
+            for fname, hash, mtime in rows:
+                self.add_file(cur.lastrowid, fname, hash, mtime)
+
+    def add_file(self, backup: int, fname: str, hash: str,
+                 mtime: str) -> None:
+        """Add an 'old' or 'new' file of a backup to the catalog."""
+        path = util.normalize(fname)
+        self.db.execute('insert or ignore into paths (path) values (?)',
+                        (path,))
+        self.db.execute('insert or replace into files '
+                        'select ?, id, ?, ? from paths where path = ?',
+                        (backup, hash, float(mtime), path))
+
+    def find(self, pattern: str,
+             backup: Optional[str] = None) -> Iterator[Found]:
+        """Yield the files matching 'pattern', in 'backup' or in all.
+
+        They come in order of backup name, then path. A bad pattern
+        raises re.error.
+        """
+        pat = re.compile(fnmatch.translate(pattern))
+        self.db.create_function('fnmatch', 1,
+                                lambda path: pat.match(path) is not None,
+                                deterministic=True)
+        prefix = re.split(r'[*?[]', pattern, 1)[0]
+        # The subquery runs once, so each path is matched just once.
+        paths = 'select id from paths where fnmatch(path)'
+        args = []
+        if prefix:
+            # Every string that starts with 'prefix' is in this range.
+            paths += ' and path >= ? and path < ?'
+            args += [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+        query = 'select b.name, p.path, f.hash, f.mtime from files f ' \
+            'join paths p on p.id = f.path ' \
+            'join backups b on b.id = f.backup ' \
+            f'where f.path in ({paths})'
+        if backup is not None:
+            query += ' and b.name = ?'
+            args.append(backup)
+        query += ' order by b.name, p.path'
+        yield from self.db.execute(query, args)
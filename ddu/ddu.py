@@ -5,7 +5,8 @@ ddu.py: Deduplicating utility for backup/restore
 Usage:
     ddu.py [--log=<level>] (create | unlock) REPO
     ddu.py verify [--backups] [--hashes] [--orphans] [-d] REPO
-    ddu.py backup [-v] [--verify] [--prefix=<pre>] --repo=<repo> FILE ...
+    ddu.py backup [-v] [--verify] [--prefix=<pre>] [--workers=<n>] \
+[--incremental] --repo=<repo> FILE ...
     ddu.py restore REPO
     ddu.py --version
     ddu.py --help
@@ -21,11 +22,16 @@ Options:
     -d                 Delete bad or orphan hashes, if found.
     --verify           Verify the backup, after doing it.
     --prefix <pre>     Prefix for backup name. Suffixed by date, time.
+    --workers <n>      Files to hash and compress at once. 0 means one
+                       per CPU. [default: 0]
+    --incremental      Don't read files with the same size and mtime as
+                       in the last backup with this prefix.
 """
 
 # -------------------- imports
 
 import logging
+import os
 import re
 import time
 
@@ -59,6 +65,9 @@ def main() -> None:
     elif args['verify']:
         repos = Repo(repo_file)
         logging.info(f'Verifying repo {repo_file}')
+        # Deleting objects, and saving the index, needs the repo to itself.
+        if args['-d'] and not repos.lock():
+            util.fatal(f'repo {repo_file} is LOCKED')
         n = 0
         if args['--hashes']:
             repos.verify_all_hashes(delete=args['-d'])
@@ -71,6 +80,8 @@ def main() -> None:
             n += 1
         if n == 0:
             util.msg('You must use --hashes, --backups, or --orphans')
+        if args['-d']:
+            repos.unlock()
     elif args['unlock']:
         # XXX Could this be: Repo(repo_file).unlock() ?
         repos = Repo(repo_file)
@@ -81,9 +92,16 @@ def main() -> None:
         if not alphanum.match(prefix):
             util.fatal('prefix must be alphanumeric')
         want_verify = args['--verify']
+        workers = int(args['--workers'])
+        if workers < 0:
+            util.fatal('workers must not be negative')
+        if workers == 0:
+            workers = os.cpu_count() or 1
         backup.run_backup(args['--repo'], prefix, args['FILE'],
                           verify=want_verify,
-                          verbose=args['-v'])
+                          verbose=args['-v'],
+                          workers=workers,
+                          incremental=args['--incremental'])
     elif args['restore']:
         restore.restore(repo_file)
 
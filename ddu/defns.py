@@ -1,4 +1,6 @@
 
 from collections import namedtuple
 
-Entry = namedtuple('Entry', 'old_or_new hash mtime fname')
+# 'size' is missing from backups made before it was recorded.
+Entry = namedtuple('Entry', 'old_or_new hash mtime fname size',
+                   defaults=('',))
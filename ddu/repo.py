@@ -1,11 +1,13 @@
 
 import gzip
 import hash
+import hashlib
 import logging
 import os
-import shutil
+import tempfile
+import threading
 import time
-from typing import Set, Tuple, List, Generator
+from typing import Dict, Set, Tuple, List, Generator, Optional
 
 from defns import Entry
 import util
@@ -17,6 +19,11 @@ LOCK_FILE = '/LOCK'
 OBJECTS = '/objects'
 BACKUPS = '/backups'
 SIG = '/signature'
+TMP = '/tmp'  # objects being written, until their hash is known
+INDEX = '/index'  # the saved object index
+
+INDEX_MAGIC = b'ddu-index 1\n'
+DIGEST_SIZE = 20  # bytes in a binary SHA1
 
 COMP_LEVEL = 9  # gzip compression level to use
 
@@ -31,11 +38,23 @@ class Repo:
         self.lock_name = repo + LOCK_FILE
         self.objects = repo + OBJECTS
         self.backups = repo + BACKUPS
+        self.tmp = repo + TMP
+        self.index_file = repo + INDEX
         self.all_backups = self.get_all_backups()
         self.sig_file = repo + SIG
         if not self.quick_verify():
             util.fatal(f'{repo} is not a repository')
         self.bytes_written = 0
+        # Backup workers store files at the same time. 'stored' holds the
+        # hashes stored since this Repo was opened, including any still
+        # being written, so each new object is written just once.
+        self.store_lock = threading.RLock()
+        self.stored: Set[str] = set()
+        # The hashes in 'objects', as binary digests. See object_index().
+        self.index: Optional[Set[bytes]] = None
+        # Each fan-out directory's mtime_ns when it was read into the
+        # index, or 0 if this process has changed it since.
+        self.mtimes: Dict[str, int] = {}
 
     def lock(self) -> bool:
         """Lock the repo. Return True if successful"""
@@ -46,6 +65,8 @@ class Repo:
         else:
             open(self.lock_name, 'w').close()
             logging.info('repo locked')
+            # Repositories made before there was a 'tmp' don't have one.
+            os.makedirs(self.tmp, exist_ok=True)
             return True
 
     def unlock(self) -> None:
@@ -89,13 +110,19 @@ class Repo:
         # logging.info('repo verify complete')
         return True
 
+    def backup_ended(self, backup: str) -> bool:
+        """Return True if 'backup' has its 'end' trailer."""
+        fname = os.path.join(self.backups, backup)
+        with open(fname, 'rt') as fd:
+            return any(line.startswith('end') for line in fd)
+
     def next_file(self, backup: str) -> Generator[Entry, None, None]:
         """Return the file entries from 'backup'."""
         fname = os.path.join(self.backups, backup)
         with open(fname, 'rt') as fd:
             for line in fd:
                 if line[0:3] in ('old', 'new'):
-                    yield Entry._make(line.rstrip().split('\t'))
+                    yield Entry(*line.rstrip('\n').split('\t'))
 
     def find_orphans(self, delete=False) -> None:
         """Find hashes not linked to a backed up file. Maybe delete them."""
@@ -115,22 +142,47 @@ class Repo:
             if delete:
                 fname = self.fname_from_hash(h)
                 os.remove(os.path.join(self.objects, fname[0], fname[1]))
-
-    def store_file(self, path: str, hash: str) -> bool:
-        """Store file 'path' in the repo with name taken from 'hash'.
-
-        Store it like in a git repository, and return True. If there is
-        already a stored file by that name, just return False.
+                self.forget_hash(h)
+        if delete:
+            self.save_index()
+
+    def store_file(self, path: str) -> Tuple[str, bool]:
+        """Store file 'path' in the repo, and return (its hash, stored).
+
+        The file is read once. Each block goes to SHA1 and to a gzip
+        stream into a temporary file in 'tmp'. When the hash is known, the
+        temporary file is renamed to its name in 'objects', like in a git
+        repository, and 'stored' is True. If there is already a stored
+        file by that name, the temporary file is deleted instead.
+        This is safe to call from several threads at once.
         """
-        # print(f'repo storing {path} as {hash}')
-        (d, f) = self.fname_from_hash(hash)
-        fname = os.path.join(d, f)
-        if self.find_file(fname):
-            # print(f'{fname} not stored')
-            return False
-        else:
-            self.write_file(path, fname)
-            return True
+        fd, tmp_name = tempfile.mkstemp(dir=self.tmp)
+        try:
+            sha1 = hashlib.sha1()
+            with open(fd, 'wb') as f_tmp, open(path, 'rb') as f_in:
+                with gzip.GzipFile(filename='', mode='wb', fileobj=f_tmp,
+                                   compresslevel=COMP_LEVEL) as f_out:
+                    while True:
+                        data = f_in.read(hash.BUF_SIZE)
+                        if not data:
+                            break
+                        sha1.update(data)
+                        f_out.write(data)
+            h = sha1.hexdigest()
+            (d, f) = self.fname_from_hash(h)
+            fname = os.path.join(d, f)
+            with self.store_lock:
+                if h in self.stored or self.find_file(fname):
+                    # print(f'{fname} not stored')
+                    os.remove(tmp_name)
+                    return (h, False)
+                self.stored.add(h)
+            self.move_file(tmp_name, fname)
+            return (h, True)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
 
     def next_hash(self) -> Generator[Tuple[str, str], None, None]:
         """Yield each '(dd, h...h) in the object directory."""
@@ -138,6 +190,12 @@ class Repo:
             for f in files:
                 yield (d, f)
 
+    def last_backup(self, prefix: str) -> Optional[str]:
+        """Return the latest backup named with 'prefix', or None."""
+        # Names look like 'prefix_YYYYmmdd_HHMMSS', so they sort by time.
+        names = [b for b in self.all_backups if b.rsplit('_', 2)[0] == prefix]
+        return max(names) if names else None
+
     def get_all_backups(self) -> List[str]:
         """Return a list of all backup files in the 'backups' directory."""
         return [f for f in os.listdir(self.backups)
@@ -155,7 +213,10 @@ class Repo:
                 if delete:
                     # print('deleting', os.path.join(d, f))
                     os.remove(os.path.join(d, f))
+                    self.forget_hash(d[-2:] + f)
                 nerrors += 1
+        if delete:
+            self.save_index()
         util.msg(f'files = {nfiles}, errors = {nerrors}')
 
     def verify_backups(self, only='') -> None:
@@ -235,31 +296,128 @@ class Repo:
     def find_file(self, fname: str) -> bool:
         """Return True if 'fname' is in the repository.
 
-        Filename looks like 'dd/h...h'.
+        Filename looks like 'dd/h...h'. This looks in the object index,
+        not on the disk.
         """
         # logging.info(f'finding {fname}')
-        full_name = self.objects + '/' + fname
-        if os.path.isfile(full_name):
-            return True
-        else:
-            return False
+        return bytes.fromhex(fname[0:2] + fname[3:]) in self.object_index()
 
-    def write_file(self, path: str, fname: str) -> None:
-        """Write contents of 'path' into the object 'fname'.
+    def object_index(self) -> Set[bytes]:
+        """Return the set of hashes in 'objects', as binary digests.
+
+        It is made the first time it's needed. A fan-out directory that
+        has the same mtime as when it was read for the index file gets its
+        hashes from the index file. Any other one is read with scandir.
+        """
+        index = self.index
+        if index is None:
+            with self.store_lock:
+                if self.index is None:
+                    self.index = self.build_index()
+                index = self.index
+        return index
+
+    def build_index(self) -> Set[bytes]:
+        """Return the hashes in 'objects', using the index file if valid."""
+        saved = self.read_index()
+        index: Set[bytes] = set()
+        scanned = 0
+        with os.scandir(self.objects) as dirs:
+            for d in dirs:
+                if len(d.name) != 2 or not d.is_dir():
+                    continue
+                # Take the mtime before reading, so that a change made
+                # while it's read makes the saved index look stale.
+                mtime = d.stat().st_mtime_ns
+                self.mtimes[d.name] = mtime
+                old = saved.get(d.name)
+                if old is not None and old[0] == mtime:
+                    index.update(old[1])
+                    continue
+                scanned += 1
+                with os.scandir(d.path) as files:
+                    for f in files:
+                        try:
+                            index.add(bytes.fromhex(d.name + f.name))
+                        except ValueError:
+                            util.warning(f'not an object: {f.path}')
+        logging.info(f'object index: {len(index)} hashes, '
+                     f'{scanned} directories scanned')
+        return index
+
+    def read_index(self) -> Dict[str, Tuple[int, List[bytes]]]:
+        """Return {dd: (mtime_ns, digests)} from the index file.
+
+        The file starts with INDEX_MAGIC. Then, for each directory, there
+        is a line 'dd mtime_ns count', followed by 'count' digests.
+        """
+        try:
+            with open(self.index_file, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+        saved: Dict[str, Tuple[int, List[bytes]]] = {}
+        if not data.startswith(INDEX_MAGIC):
+            util.warning(f'{self.index_file} is not an index. Ignored.')
+            return {}
+        pos = len(INDEX_MAGIC)
+        try:
+            while pos < len(data):
+                end = data.index(b'\n', pos)
+                d, mtime, count = data[pos:end].decode().split()
+                pos = end + 1
+                end = pos + int(count) * DIGEST_SIZE
+                if end > len(data):
+                    raise ValueError('truncated')
+                saved[d] = (int(mtime), [data[n:n + DIGEST_SIZE] for n in
+                                         range(pos, end, DIGEST_SIZE)])
+                pos = end
+        except ValueError:
+            util.warning(f'{self.index_file} is damaged. Ignored.')
+            return {}
+        return saved
+
+    def save_index(self) -> None:
+        """Save the object index to a file.
+
+        Each directory is saved with its mtime from when it was read, or
+        0 if this process changed it, so the next build_index rescans it.
+        """
+        if self.index is None:
+            return
+        groups: Dict[str, List[bytes]] = {}
+        for digest in self.index:
+            groups.setdefault(digest[0:1].hex(), []).append(digest)
+        tmp_name = self.index_file + '.tmp'
+        with open(tmp_name, 'wb') as f:
+            f.write(INDEX_MAGIC)
+            for d, digests in sorted(groups.items()):
+                mtime = self.mtimes.get(d, 0)
+                f.write(f'{d} {mtime} {len(digests)}\n'.encode())
+                f.write(b''.join(digests))
+        os.replace(tmp_name, self.index_file)
+        logging.info(f'saved object index: {len(self.index)} hashes')
+
+    def forget_hash(self, hash: str) -> None:
+        """Remove 'hash' from the object index, after deleting it."""
+        self.object_index().discard(bytes.fromhex(hash))
+        self.mtimes[hash[0:2]] = 0
+
+    def move_file(self, tmp_name: str, fname: str) -> None:
+        """Rename the stored temporary file 'tmp_name' to object 'fname'.
 
         'fname' should look like 'dd/h...h'.
         """
         logging.info(f'writing {fname}')
         full_name = self.objects + '/' + fname
         dir = self.objects + '/' + fname[0:2]
-        # self.make_dir(dir)
-        if not os.path.isdir(dir):
-            os.mkdir(dir)
-        with open(path, 'rb') as f_in:
-            with gzip.open(full_name, 'wb', compresslevel=COMP_LEVEL) as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        hash_size = os.stat(full_name).st_size
-        self.bytes_written += hash_size
+        os.makedirs(dir, exist_ok=True)
+        hash_size = os.stat(tmp_name).st_size
+        os.replace(tmp_name, full_name)
+        with self.store_lock:
+            self.bytes_written += hash_size
+            self.object_index().add(bytes.fromhex(fname[0:2] + fname[3:]))
+            self.mtimes[fname[0:2]] = 0
 
     # def make_dir(self, dir: str) -> None:
         # """Make directory 'dir' if it does not exist."""
@@ -302,6 +460,7 @@ def _create_repo_contents(repo: str) -> None:
     """
     os.mkdir(repo + '/objects')
     os.mkdir(repo + '/backups')
+    os.mkdir(repo + TMP)
     with open(repo + '/signature', 'wt') as sig:
         print(f'sig=ddu-repo', file=sig)
         print(f'version={REPO_VERSION}', file=sig)
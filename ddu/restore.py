@@ -1,14 +1,15 @@
 
-import fnmatch
 import gzip
 import os
 import re
 import shutil
+import sqlite3
 import time
 from typing import Generator
 
 import parser_ddu as parser
 
+from catalog import Catalog
 from pager import Pager
 from repo import Repo
 import util
@@ -25,6 +26,7 @@ NO_DEST = '<none>'
 
 class Globals:
     repo: Repo
+    catalog: Catalog
     backup: str
     destination: str
 
@@ -39,7 +41,16 @@ g.destination = NO_DEST
 def restore(repo_file: str) -> None:
     """Interact with the user to perform repo query and backup function."""
     g.repo = Repo(repo_file)
-    g.repo.lock()
+    # A backup may be running. Its lock is left for it to remove.
+    locked = g.repo.lock()
+    try:
+        g.catalog = Catalog(g.repo)
+        g.catalog.sync()
+    except sqlite3.OperationalError as e:
+        if locked:
+            g.repo.unlock()
+        util.fatal(f'cannot use the catalog of {repo_file}: {e}. '
+                   'Is a backup finishing? Try again.')
 
     parser.init()
     while True:
@@ -80,7 +91,9 @@ def restore(repo_file: str) -> None:
             show_help()
         else:
             util.msg(f'syntax error: {cmd}')
-    g.repo.unlock()
+    g.catalog.close()
+    if locked:
+        g.repo.unlock()
 
 
 def show_info() -> None:
@@ -101,18 +114,9 @@ def find_files(pattern: str) -> None:
     """Search all backups for files matching 'pattern'."""
     p = Pager()
     try:
-        xpat = fnmatch.translate(pattern)
-        pat = re.compile(xpat)
-        stop = False
-        for b in g.repo.all_backups:
-            if not stop:
-                for f in g.repo.next_file(b):
-                    fname = normalize(f.fname)
-                    if pat.match(fname):
-                        mtime = time.ctime(float(f.mtime))
-                        if not p.print(f'{b}\t{mtime}\t{fname}'):
-                            stop = True
-                            break
+        for b, fname, _, mtime in g.catalog.find(pattern):
+            if not p.print(f'{b}\t{time.ctime(mtime)}\t{fname}'):
+                break
     except re.error:
         util.error('Bad search pattern')
 
@@ -136,26 +140,22 @@ def list_all_files() -> None:
     else:
         p = Pager()
         count = 0
-        for f in g.repo.next_file(g.backup):
+        for _, fname, _, _ in g.catalog.find('*', g.backup):
             count += 1
-            if not p.print(normalize(f.fname)):
+            if not p.print(fname):
                 break
         print('Files found:', count)
 
 
 def list_files(pattern: str, backup: str) -> None:
     """List files in 'backup' that match 'pattern'."""
-    xpat = fnmatch.translate(pattern)
     try:
-        pat = re.compile(xpat)
         count = 0
         p = Pager()
-        for f in g.repo.next_file(backup):
-            fname = normalize(f.fname)
-            if pat.match(fname):
-                if not p.print(fname):
-                    break
-                count += 1
+        for _, fname, _, _ in g.catalog.find(pattern, backup):
+            if not p.print(fname):
+                break
+            count += 1
         # print('Files found:', count)
     except re.error:
         util.error('Bad search pattern')
@@ -191,30 +191,25 @@ def restore_files(pattern: str, src: str, dest_dir: str) -> None:
             if not os.path.exists(backup_name):
                 util.error(f'Invalid backup: {src}')
                 return
-        xpat = fnmatch.translate(pattern)
         try:
-            pat = re.compile(xpat)
             num_restored = 0
             num_skipped = 0
-            for f in g.repo.next_file(src):
-                fname = normalize(f.fname)
-                if pat.match(fname):
-                    d, fn = Repo.fname_from_hash(f.hash)
-                    h = os.path.join(g.repo.objects, d, fn)
-                    dest_file = os.path.join(dest_dir, fname)
-                    if os.path.exists(dest_file):
-                        util.warning(f'SKIPPED: Already exists {dest_file}.')
-                        num_skipped += 1
-                    elif not os.path.exists(h):
-                        # The hash will be missing if it failed verification.
-                        util.warning(f'SKIPPED: Missing hash for {dest_file}.')
-                        num_skipped += 1
-                    else:
-                        print(f'copy_hash {h} -> {dest_file}')
-                        copy_hash(h, dest_file)
-                        mtime = float(f.mtime)
-                        os.utime(dest_file, (mtime, mtime))
-                        num_restored += 1
+            for _, fname, hash, mtime in g.catalog.find(pattern, src):
+                d, fn = Repo.fname_from_hash(hash)
+                h = os.path.join(g.repo.objects, d, fn)
+                dest_file = os.path.join(dest_dir, fname)
+                if os.path.exists(dest_file):
+                    util.warning(f'SKIPPED: Already exists {dest_file}.')
+                    num_skipped += 1
+                elif not g.repo.find_file(os.path.join(d, fn)):
+                    # The hash will be missing if it failed verification.
+                    util.warning(f'SKIPPED: Missing hash for {dest_file}.')
+                    num_skipped += 1
+                else:
+                    print(f'copy_hash {h} -> {dest_file}')
+                    copy_hash(h, dest_file)
+                    os.utime(dest_file, (mtime, mtime))
+                    num_restored += 1
             print(f'Files restored/skipped = {num_restored}/{num_skipped}.')
         except re.error:
             util.error('Bad search pattern.')
@@ -260,29 +255,3 @@ def copy_hash(src: str, dest_file: str) -> None:
         with gzip.open(src, 'rb') as f_in, open(dest_file, 'wb') as f_out:
             shutil.copyfileobj(f_in, f_out)
 
-
-def normalize(fname: str) -> str:
-    """Fixup 'fname' to work better with restores.
-
-    Two things:
-    1. If it starts with './' or '.\', remove those two characters.
-    2. If it's an absolute pathname, e.g., 'c:\' or 'c:/' on Windows,
-    remove those three characters. This way, we can concatenate the destination
-    directory with this new fname, and it'll work like we expect.
-    """
-    if fname[0] == '.':
-        return fname[2:] if fname[1] in ('/', '\\') else fname
-        # if fname[1] in ('/', '\\'):
-        #     return fname[2:]
-        # else:
-        #     return fname
-    elif fname[0] == '/':
-        # On Linux
-        return fname[1:]
-    elif fname[0].isalpha() and util.os_is_windows:
-        if fname[1] == ':' and fname[2] in ('/', '\\'):
-            return fname[3:]
-        else:
-            return fname
-    else:
-        return fname
@@ -36,3 +36,30 @@ def error(s: str) -> None:
     msg = 'ERROR: ' + s
     print(msg, file=sys.stderr)
     logging.warning(s)
+
+
+def normalize(fname: str) -> str:
+    """Fixup 'fname' to work better with restores.
+
+    Two things:
+    1. If it starts with './' or '.\', remove those two characters.
+    2. If it's an absolute pathname, e.g., 'c:\' or 'c:/' on Windows,
+    remove those three characters. This way, we can concatenate the destination
+    directory with this new fname, and it'll work like we expect.
+    """
+    if fname[0] == '.':
+        return fname[2:] if fname[1] in ('/', '\\') else fname
+        # if fname[1] in ('/', '\\'):
+        #     return fname[2:]
+        # else:
+        #     return fname
+    elif fname[0] == '/':
+        # On Linux
+        return fname[1:]
+    elif fname[0].isalpha() and os_is_windows:
+        if fname[1] == ':' and fname[2] in ('/', '\\'):
+            return fname[3:]
+        else:
+            return fname
+    else:
+        return fname